@@ -1,64 +1,318 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Request, Response, render_template, request, jsonify, send_from_directory
 import os
-import cv2
-from PIL import Image
-import re
-import pytesseract
 import base64
 import tempfile
-import traceback
-from werkzeug.utils import secure_filename
+import binascii
 import json
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext
 
 # Import your existing functions
-from identification import extract_id_info, detect_id_card
+from idcore import (LANG_MODES, UNKNOWN_ID_TYPE, card_details, compare_id_info, extract_pdf_info, init_pool_worker,
+                    is_pdf)
+from jobs import JobQueue, QueueFullError
+from card_store import get_card_store
+from metrics import count_error, get_metrics, stage, trace
+from ocr_cache import get_cache
+
+# Uploads above this size are spooled to tmpfs (when available) instead of memory
+UPLOAD_SPOOL_THRESHOLD = 4 * 1024 * 1024
+UPLOAD_SPOOL_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+class SpooledUploadRequest(Request):
+    """Keeps multipart uploads in memory, spooling only large ones to tmpfs"""
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_THRESHOLD, mode='rb+', dir=UPLOAD_SPOOL_DIR)
 
 app = Flask(__name__)
+app.request_class = SpooledUploadRequest
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['SECRET_KEY'] = 'your-secret-key-here'
-
-# Ensure upload folder exists
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+app.config['OCR_WORKERS'] = int(os.environ.get('OCR_WORKERS', os.cpu_count() or 1))
+app.config['BATCH_MAX_FILES'] = 20
+app.config['COMPARE_BATCH_MAX'] = 10000  # candidates per /compare/batch request
+app.config['JOB_MAX_PENDING'] = int(os.environ.get('JOB_MAX_PENDING', 100))
+app.config['JOB_RESULT_TTL'] = 3600  # seconds finished jobs stay available
 
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'pdf'}
 
+# Leading bytes of each accepted format
+FILE_SIGNATURES = [
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'BM', 'bmp'),
+    (b'%PDF', 'pdf'),
+]
+
+# Raw request bodies accepted by /upload without multipart parsing
+RAW_CONTENT_TYPES = {'application/octet-stream', 'application/pdf'}
+
+# Streaming response formats of /upload and their content types
+STREAM_FORMATS = {'ndjson': 'application/x-ndjson', 'sse': 'text/event-stream'}
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def detect_format(data):
+    """Identify an accepted file format from its leading bytes, or None"""
+    for signature, fmt in FILE_SIGNATURES:
+        if data.startswith(signature):
+            return fmt
+    return None
+
+def requested_lang_mode():
+    """OCR language mode override from the ``lang`` query parameter, or None"""
+    lang_mode = request.args.get('lang')
+    if lang_mode:
+        # An unescaped '+' in a query string arrives as a space
+        lang_mode = lang_mode.replace(' ', '+')
+    if lang_mode and lang_mode not in LANG_MODES:
+        raise ValueError(f"Unsupported lang '{lang_mode}' (use one of: {', '.join(sorted(LANG_MODES))})")
+    return lang_mode
+
+def requested_stream_format():
+    """Streaming format from the ``stream`` query parameter, or None for one JSON response"""
+    fmt = request.args.get('stream', '').lower()
+    if fmt in ('', '0', 'false', 'no'):
+        return None
+    if fmt not in STREAM_FORMATS:
+        raise ValueError(f"Unsupported stream '{fmt}' (use one of: {', '.join(sorted(STREAM_FORMATS))})")
+    return fmt
+
+def read_upload():
+    """Return (data, filename) for the file in the current request.
+
+    Accepts a multipart ``file`` field, a JSON body
+    ``{"filename": ..., "content": <base64>}``, or the raw file bytes as the
+    request body (``image/*``, ``application/pdf`` or
+    ``application/octet-stream``, filename optional via ``X-Filename``).
+    Raises ValueError with a client-facing message on bad input.
+    """
+    data, filename = _read_upload_body()
+    # Raw bodies may come without a name, in which case the content decides
+    if (filename and not allowed_file(filename)) or (not filename and detect_format(data) is None):
+        raise ValueError('Invalid file type')
+    return data, filename
+
+def _read_upload_body():
+    if request.is_json:
+        payload = request.get_json(silent=True) or {}
+        content = payload.get('content')
+        if not content:
+            raise ValueError('No file provided')
+        try:
+            data = base64.b64decode(content, validate=True)
+        except (binascii.Error, TypeError):
+            raise ValueError('File content is not valid base64')
+        return data, payload.get('filename') or ''
+
+    if request.mimetype.startswith('image/') or request.mimetype in RAW_CONTENT_TYPES:
+        return request.get_data(cache=False), request.headers.get('X-Filename', '')
+
+    if 'file' not in request.files:
+        raise ValueError('No file provided')
+    file = request.files['file']
+    if file.filename == '':
+        raise ValueError('No file selected')
+    return file.read(), file.filename
+
+# Create the OCR cache and metrics before any worker pool forks so they share their counters
+get_cache()
+get_metrics()
+
+# Worker processes for OCR, created on first use so the Flask reloader and
+# imports of this module don't fork a pool nobody needs
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+
+def get_ocr_pool():
+    """Return the shared OCR process pool, creating it on first use"""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None:
+            _ocr_pool = ProcessPoolExecutor(max_workers=app.config['OCR_WORKERS'], initializer=init_pool_worker)
+        return _ocr_pool
+
+def replace_ocr_pool(broken):
+    """Drop a pool broken by a crashed worker (segfault, OOM kill); the next get_ocr_pool starts a fresh one"""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is broken:
+            _ocr_pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def submit_ocr(fn, *args):
+    """Submit fn(*args) to the OCR pool, replacing the pool first if a worker crash has broken it"""
+    pool = get_ocr_pool()
+    try:
+        return pool.submit(fn, *args)
+    except BrokenProcessPool:
+        replace_ocr_pool(pool)
+        return get_ocr_pool().submit(fn, *args)
+
+def ocr_result(future, fn, *args):
+    """Result of an OCR pool future; a task lost to a crashed worker is run once more on a fresh pool"""
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        return submit_ocr(fn, *args).result()
+
+# Asynchronous jobs share the OCR pool with /upload/batch
+job_queue = JobQueue(submit_ocr, max_pending=app.config['JOB_MAX_PENDING'], ttl=app.config['JOB_RESULT_TTL'])
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def timings_requested():
+    return request.args.get('timings', '').lower() in ('1', 'true', 'yes')
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
+    """Process one ID card file.
+
+    With ``?timings=1`` the response carries a ``timings`` object: the
+    milliseconds spent in each pipeline stage for this request.
+
+    With ``?stream=ndjson`` (or ``sse`` for Server-Sent Events) each card
+    is sent as soon as it is read, followed by a summary record; see
+    stream_id_card.
+    """
     try:
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file provided'}), 400
-        
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
-        
-        if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            
-            # Process the file
-            result = process_id_card(filepath)
-            
-            # Clean up the uploaded file
-            os.remove(filepath)
+        try:
+            stream_format = requested_stream_format()
+        except ValueError as e:
+            count_error('bad_request')
+            return jsonify({'error': str(e)}), 400
+        if stream_format:
+            return upload_stream(stream_format)
+
+        with (trace() if timings_requested() else nullcontext()) as timings, stage('request'):
+            try:
+                data, filename = read_upload()
+                lang_mode = requested_lang_mode()
+            except ValueError as e:
+                count_error('bad_request')
+                return jsonify({'error': str(e)}), 400
             
+            # Process the file straight from memory
+            result = process_id_card(data, filename, lang_mode)
+        if timings is not None:
+            result['timings'] = timings.as_dict()
+        with stage('serialize'):
             return jsonify(result)
-        else:
-            return jsonify({'error': 'Invalid file type'}), 400
+    
+    except Exception as e:
+        count_error('server_error')
+        return jsonify({'error': str(e)}), 500
+
+def upload_stream(stream_format):
+    """Streaming /upload: the cards are read while the response is being sent"""
+    try:
+        data, filename = read_upload()
+        lang_mode = requested_lang_mode()
+    except ValueError as e:
+        count_error('bad_request')
+        return jsonify({'error': str(e)}), 400
+    records = stream_id_card(data, filename, lang_mode, timings_requested())
+    return Response(encode_stream(records, stream_format), mimetype=STREAM_FORMATS[stream_format],
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/upload/batch', methods=['POST'])
+def upload_batch():
+    """Process several ID card files in one request across the OCR pool.
+
+    Results are returned in the same order as the uploaded files; a file
+    that fails is reported in its own slot without failing the batch.
+    """
+    try:
+        files = request.files.getlist('files') or request.files.getlist('file')
+        if not files:
+            count_error('bad_request')
+            return jsonify({'error': 'No files provided'}), 400
+        if len(files) > app.config['BATCH_MAX_FILES']:
+            count_error('bad_request')
+            return jsonify({'error': f"Too many files (max {app.config['BATCH_MAX_FILES']})"}), 400
+        try:
+            lang_mode = requested_lang_mode()
+        except ValueError as e:
+            count_error('bad_request')
+            return jsonify({'error': str(e)}), 400
+
+        results = [None] * len(files)
+        pending = []
+        for index, file in enumerate(files):
+            if file.filename == '':
+                results[index] = failed_result('No file selected')
+            elif not allowed_file(file.filename):
+                results[index] = failed_result('Invalid file type')
+            else:
+                args = (file.read(), file.filename, lang_mode)
+                pending.append((index, args, submit_ocr(process_id_card, *args)))
+            if results[index] is not None:
+                results[index]['filename'] = file.filename
+
+        for index, args, future in pending:
+            try:
+                result = ocr_result(future, process_id_card, *args)
+            except Exception as e:
+                result = failed_result(str(e))
+            result['filename'] = files[index].filename
+            results[index] = result
+
+        return jsonify({
+            'results': results,
+            'total': len(results),
+            'succeeded': sum(1 for result in results if result['success'])
+        })
+
+    except Exception as e:
+        count_error('server_error')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Queue an ID card for processing and return its job id immediately.
+
+    Accepts the same bodies and ``lang`` override as /upload; poll
+    ``GET /jobs/<job_id>`` for the result.
+    """
+    try:
+        try:
+            data, filename = read_upload()
+            lang_mode = requested_lang_mode()
+        except ValueError as e:
+            count_error('bad_request')
+            return jsonify({'error': str(e)}), 400
+        
+        try:
+            job_id = job_queue.submit(process_id_card, data, filename, lang_mode)
+        except QueueFullError as e:
+            count_error('queue_full')
+            return jsonify({'error': str(e)}), 503
+        
+        return jsonify({
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': f'/jobs/{job_id}'
+        }), 202
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
 @app.route('/compare', methods=['POST'])
 def compare_cards():
     try:
@@ -75,137 +329,251 @@ def compare_cards():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def process_id_card(filepath):
-    """Process an ID card image and extract information, and return checklist flags"""
+@app.route('/compare/batch', methods=['POST'])
+def compare_batch():
+    """Rank many candidate records by fuzzy similarity to one card.
+
+    Body: ``{"card": {...}, "candidates": [{...}, ...], "limit": 20,
+    "min_score": 0}`` with cards shaped like /upload results (or
+    ``{"details": {...}}``). Returns the best candidates with their
+    overall and per-field similarity scores between 0 and 1.
+    """
     try:
-        # Use your existing extract_id_info function
-        result = extract_id_info(filepath)
-        id_type = result.get('ID Type', 'Unknown')
-        details = result.get('Details', {})
-        raw_text = result.get('Raw Text', '')
-
-        # Checklist logic
-        accessible = os.path.exists(filepath)
-        ext = os.path.splitext(filepath)[-1].lower()
-        is_image = ext in ['.jpg', '.jpeg', '.png', '.bmp', '.gif']
-        is_pdf = ext == '.pdf'
-        expected_format = is_image or is_pdf
-        type_verified = id_type != 'Unknown'
-        all_fields_present = bool(details)
-        no_blank_fields = all(bool(v) for v in details.values()) if details else False
-
-        checklist = {
-            'uploaded': accessible,
-            'expected_format': expected_format,
-            'type_verified': type_verified,
-            'all_fields_present': all_fields_present,
-            'no_blank_fields': no_blank_fields
-        }
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'A JSON object body is required'}), 400
+        card = data.get('card')
+        candidates = data.get('candidates')
+        if not card or not isinstance(candidates, list) or not candidates:
+            return jsonify({'error': 'A card and a list of candidates are required'}), 400
+        if not isinstance(card, dict) or not all(isinstance(candidate, dict) for candidate in candidates):
+            return jsonify({'error': 'The card and every candidate must be objects'}), 400
+        if len(candidates) > app.config['COMPARE_BATCH_MAX']:
+            return jsonify({'error': f"Too many candidates (max {app.config['COMPARE_BATCH_MAX']})"}), 400
+        try:
+            limit = int(data.get('limit', 20))
+            min_score = float(data.get('min_score', 0))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'limit and min_score must be numbers'}), 400
+        if limit < 1:
+            return jsonify({'error': 'limit must be at least 1'}), 400
+        
+        # numpy is only loaded once this route is used
+        from fuzzy_match import MAX_FIELD_LENGTH, get_index, oversized_fields
+        if any(oversized_fields(record) for record in [card] + candidates):
+            return jsonify({'error': f'Field values must be at most {MAX_FIELD_LENGTH} characters'}), 400
+        index = get_index(candidates)
+        return jsonify({'results': index.rank(card, limit, min_score), 'total': len(candidates)})
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        return {
-            'success': True,
-            'id_type': id_type,
-            'details': details,
-            'raw_text': raw_text,
-            'checklist': checklist
-        }
+def process_id_card(data, filename=None, lang_mode=None):
+    """Process an in-memory ID card file and extract information, and return checklist flags.
+
+    PDFs are read page by page and each card found on a page or image
+    separately; every card of a PDF or multi-card image is reported under
+    ``pages`` and the first recognised card fills the top-level fields.
+    """
+    try:
+        pages = list(iter_cards(data, lang_mode))
+        if not pages:
+            raise ValueError('No pages found in PDF')
+
+        checklist = file_checklist(data)
+        for page in pages:
+            merge_checks(checklist, card_checks(page))
+
+        record_cards(pages, filename)
+        card = next((page for page in pages if page['id_type'] != UNKNOWN_ID_TYPE), pages[0])
+        response = {'success': True, **card, 'checklist': checklist}
+        if is_pdf(data) or len(pages) > 1:
+            response['pages'] = pages
+        return response
     except Exception as e:
-        return {
-            'success': False,
-            'error': str(e),
-            'id_type': 'Unknown',
-            'details': {},
-            'raw_text': '',
-            'checklist': {
-                'uploaded': False,
-                'expected_format': False,
-                'type_verified': False,
-                'all_fields_present': False,
-                'no_blank_fields': False
-            }
-        }
+        count_error('processing')
+        return failed_result(str(e))
 
-def compare_id_info(info1, info2):
-    """Compare two ID card information sets"""
-    comparison = {
-        'name_match': False,
-        'dob_match': False,
-        'card_match': False,
-        'total_fields': 0,
-        'matching_fields': 0,
-        'field_comparisons': []
-    }
-    
-    def clean_value(value):
-        if not value:
-            return ""
-        cleaned = ' '.join(str(value).strip().upper().split())
-        cleaned = re.sub(r'[^A-Z\s\.]', '', cleaned)
-        return cleaned
-    
-    # Compare name
-    name1 = clean_value(info1.get('details', {}).get('Name'))
-    name2 = clean_value(info2.get('details', {}).get('Name'))
-    if name1 and name2:
-        comparison['total_fields'] += 1
-        comparison['name_match'] = name1 == name2
-        if comparison['name_match']:
-            comparison['matching_fields'] += 1
-        comparison['field_comparisons'].append({
-            'field': 'Name',
-            'value1': name1,
-            'value2': name2,
-            'match': comparison['name_match']
-        })
-    
-    # Compare date of birth
-    dob1 = clean_value(info1.get('details', {}).get('Date of Birth'))
-    dob2 = clean_value(info2.get('details', {}).get('Date of Birth'))
-    if dob1 and dob2:
-        comparison['total_fields'] += 1
-        comparison['dob_match'] = dob1 == dob2
-        if comparison['dob_match']:
-            comparison['matching_fields'] += 1
-        comparison['field_comparisons'].append({
-            'field': 'Date of Birth',
-            'value1': dob1,
-            'value2': dob2,
-            'match': comparison['dob_match']
-        })
-    
-    # Compare all other fields
-    all_keys = set(info1.get('details', {}).keys()) | set(info2.get('details', {}).keys())
-    for key in all_keys:
-        if key not in ['Name', 'Date of Birth']:
-            value1 = clean_value(info1.get('details', {}).get(key))
-            value2 = clean_value(info2.get('details', {}).get(key))
-            if value1 and value2:
-                comparison['total_fields'] += 1
-                field_match = value1 == value2
-                if field_match:
-                    comparison['matching_fields'] += 1
-                comparison['field_comparisons'].append({
-                    'field': key,
-                    'value1': value1,
-                    'value2': value2,
-                    'match': field_match
-                })
-    
-    # Determine overall match
-    if comparison['name_match'] and comparison['dob_match']:
-        comparison['overall_result'] = 'match'
-        comparison['result_text'] = '✅ Both ID cards belong to the same person!'
-        comparison['result_color'] = 'green'
-    elif comparison['name_match'] or comparison['dob_match']:
-        comparison['overall_result'] = 'partial'
-        comparison['result_text'] = '⚠️ Partial match: Some fields match, please review.'
-        comparison['result_color'] = 'orange'
+def stream_id_card(data, filename=None, lang_mode=None, with_timings=False):
+    """Yield one record per card of an in-memory file as soon as it is read, then a summary.
+
+    Card records are ``{"type": "card", "index": ..., <card summary>,
+    "checklist": <the card's own flags>}``. The final record is
+    ``{"type": "summary", "success": ..., "cards": <count>, "checklist":
+    ..., "first_card": <index of the first recognised card>}`` with an
+    ``error`` when reading stopped early. Only one card is held at a time.
+    """
+    with (trace() if with_timings else nullcontext()) as timings, stage('request'):
+        summary = {'type': 'summary', 'success': True, 'cards': 0, 'checklist': file_checklist(data),
+                   'first_card': None}
+        try:
+            for index, card in enumerate(iter_cards(data, lang_mode)):
+                checks = card_checks(card)
+                merge_checks(summary['checklist'], checks)
+                if summary['first_card'] is None and card['id_type'] != UNKNOWN_ID_TYPE:
+                    summary['first_card'] = index
+                summary['cards'] += 1
+                record_cards([card], filename)
+                yield {'type': 'card', 'index': index, **card, 'checklist': checks}
+            if not summary['cards']:
+                raise ValueError('No pages found in PDF')
+        except Exception as e:
+            count_error('processing')
+            summary.update(success=False, error=str(e), checklist=failed_result(str(e))['checklist'])
+    if timings is not None:
+        summary['timings'] = timings.as_dict()
+    yield summary
+
+def encode_stream(records, stream_format):
+    """Encode records as NDJSON lines or Server-Sent Events named after their type"""
+    for record in records:
+        with stage('serialize'):
+            line = json.dumps(record)
+            if stream_format == 'sse':
+                yield f"event: {record['type']}\ndata: {line}\n\n"
+            else:
+                yield line + '\n'
+
+def iter_cards(data, lang_mode=None):
+    """Yield the card_summary of every card in an in-memory file as it is read.
+
+    PDFs are read page by page and each card found on a page separately;
+    images holding several cards (or one card that isn't a tight crop) are
+    segmented into cards the same way.
+    """
+    if is_pdf(data):
+        results = extract_pdf_info(data, lang_mode=lang_mode)
     else:
-        comparison['overall_result'] = 'no_match'
-        comparison['result_text'] = '❌ ID cards do NOT belong to the same person!'
-        comparison['result_color'] = 'red'
+        # Imported on first use: segmentation needs OpenCV
+        from idcore import extract_image_info
+        results = extract_image_info(data, lang_mode=lang_mode)
+    for result in results:
+        yield card_summary(result)
+
+def file_checklist(data):
+    """Checklist of a file before any card is read; card flags start true and are merged in"""
+    return {
+        'uploaded': bool(data),
+        'expected_format': detect_format(data) is not None,
+        'type_verified': True,
+        'all_fields_present': True,
+        'no_blank_fields': True
+    }
+
+def card_checks(card):
+    """Checklist flags of one card"""
+    details = card['details']
+    return {
+        'type_verified': card['id_type'] != UNKNOWN_ID_TYPE,
+        'all_fields_present': bool(details),
+        'no_blank_fields': bool(details) and all(bool(v) for v in details.values())
+    }
+
+def merge_checks(checklist, checks):
+    # A file passes a check only if every card in it does
+    for name, passed in checks.items():
+        checklist[name] = checklist[name] and passed
+
+def record_cards(cards, filename=None):
+    """Add extracted cards to the duplicate lookup store, if enabled.
+
+    Each card summary gains ``seen_before``: whether the card or the person
+    on it was stored by an earlier submission, checked before this one is
+    added so a card never counts as its own duplicate.
+    """
+    store = get_card_store()
+    if store is None:
+        return
+    try:
+        for card in cards:
+            card['seen_before'] = store.seen(card)
+        store.add_many(cards, filename)
+    except sqlite3.Error:
+        # A busy or broken store must not fail the extraction itself
+        count_error('card_store')
+
+def card_summary(result):
+    """Response fields for one extract_id_info result"""
+    summary = {
+        'id_type': result.get('ID Type', UNKNOWN_ID_TYPE),
+        'id_scores': result.get('ID Scores', {}),
+        'details': result.get('Details', {}),
+        'field_confidence': result.get('Field Confidence', {}),
+        'validation': result.get('Validation', {}),
+        'raw_text': result.get('Raw Text', ''),
+        'preprocessing': result.get('Preprocessing', {}),
+        'ocr_language': result.get('OCR Language'),
+        'language_passes': result.get('Language Passes', []),
+        'quality_passes': result.get('Quality Passes', [])
+    }
+    if 'Page' in result:
+        summary['page'] = result['Page']
+    if 'Card' in result:
+        summary['card'] = result['Card']
+    return summary
+
+def failed_result(error):
+    """Result returned for a card that could not be processed"""
+    return {
+        'success': False,
+        'error': error,
+        'id_type': UNKNOWN_ID_TYPE,
+        'id_scores': {},
+        'details': {},
+        'raw_text': '',
+        'checklist': {
+            'uploaded': False,
+            'expected_format': False,
+            'type_verified': False,
+            'all_fields_present': False,
+            'no_blank_fields': False
+        }
+    }
+
+@app.route('/cards/lookup', methods=['GET', 'POST'])
+def lookup_card():
+    """Has this card or person been submitted before?
+
+    POST a card as returned by /upload (or ``{"details": {...}}``), or GET
+    with ``number``, ``dob`` and/or ``name`` query parameters. Uploads are
+    stored as they are read, so a card just uploaded always matches its own
+    row here; /upload's ``seen_before`` answers for earlier submissions.
+    """
+    store = get_card_store()
+    if store is None:
+        return jsonify({'error': 'Card store is disabled (set CARD_STORE to enable it)'}), 404
+    try:
+        if request.method == 'POST':
+            card = request.get_json(silent=True)
+            if not isinstance(card, dict) or not isinstance(card_details(card), dict):
+                return jsonify({'error': 'A JSON object card with a details object is required'}), 400
+        else:
+            card = {'details': {
+                'Card Number': request.args.get('number'),
+                'Date of Birth': request.args.get('dob'),
+                'Name': request.args.get('name')
+            }}
+        if not any(card_details(card).values()):
+            return jsonify({'error': 'Provide a card number, date of birth or name'}), 400
+        return jsonify(store.lookup(card))
     
-    return comparison
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/cache/stats')
+def cache_stats():
+    cache = get_cache()
+    if cache is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **cache.stats()})
+
+@app.route('/metrics')
+def metrics():
+    """Stage latency and image size histograms, language and error counters for Prometheus"""
+    collected = get_metrics()
+    if collected is None:
+        return jsonify({'error': 'Metrics are disabled (OCR_METRICS=0)'}), 404
+    return Response(collected.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/static/<path:filename>')
 def static_files(filename):
@@ -0,0 +1,214 @@
+"""Extract ID card information from many files across all cores.
+
+Inputs are files, directories (searched recursively), glob patterns, or
+``@list.txt`` files naming one input per line (``@-`` reads stdin). Each
+document is read in a worker process and written as one JSON line as soon
+as it finishes, in completion order:
+
+    {"path": ..., "success": true, "cards": [<extract_id_info result>, ...], "seconds": ...}
+
+With ``--output`` and ``--resume`` an interrupted run picks up where it
+stopped: documents already in the output file are skipped.
+
+    python batch_extract.py scans/ "archive/**/*.pdf" -o results.jsonl --resume
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from idcore import LANG_MODES, extract_image_info, extract_pdf_info, init_pool_worker, is_pdf
+from ocr_cache import get_cache
+
+EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tif', '.tiff', '.pdf'}
+# Documents submitted ahead of the workers; bounds memory however many inputs there are
+QUEUE_PER_WORKER = 2
+
+
+def iter_inputs(specs, extensions=EXTENSIONS):
+    """Yield the normalized path of every document named by specs, once each, lazily"""
+    seen = set()
+
+    def expand(spec):
+        if spec.startswith('@'):
+            with (sys.stdin if spec == '@-' else open(spec[1:])) as f:
+                for line in f:
+                    if line.strip():
+                        yield from expand(line.strip())
+        elif os.path.isdir(spec):
+            for root, dirs, files in os.walk(spec):
+                dirs.sort()
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in extensions:
+                        yield os.path.join(root, name)
+        elif glob.has_magic(spec):
+            for path in sorted(glob.iglob(spec, recursive=True)):
+                if os.path.isfile(path) and os.path.splitext(path)[1].lower() in extensions:
+                    yield path
+        else:
+            # Named explicitly: a missing file is reported as a failed document
+            yield spec
+
+    for spec in specs:
+        for path in expand(spec):
+            path = os.path.normpath(path)
+            if path not in seen:
+                seen.add(path)
+                yield path
+
+
+def extract_document(path, lang_mode=None):
+    """Read every card of one image or PDF; failures are returned, not raised"""
+    start = time.perf_counter()
+    record = {'path': path}
+    try:
+        with open(path, 'rb') as f:
+            pdf = is_pdf(f.read(4))
+        if pdf:
+            cards = list(extract_pdf_info(path, lang_mode=lang_mode))
+            if not cards:
+                raise ValueError('No pages found in PDF')
+        else:
+            cards = extract_image_info(path, lang_mode=lang_mode)
+        record.update(success=True, cards=cards)
+    except Exception as e:
+        record.update(success=False, error=f'{type(e).__name__}: {e}')
+    record['seconds'] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def completed_paths(output, retry_failed=False):
+    """Paths already recorded in an earlier run's output.
+
+    A line cut short by an interrupted run is dropped from the file so new
+    records start on a line of their own.
+    """
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, 'rb+') as f:
+        end = 0
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            end += len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if 'path' in record and (record.get('success') or not retry_failed):
+                done.add(record['path'])
+        f.truncate(end)
+    return done
+
+
+def run(paths, out, workers, lang_mode=None, skip=frozenset()):
+    """Extract every path not in skip across a process pool, writing JSON lines as results complete.
+
+    A worker crash (segfault, OOM kill) breaks the whole pool, which is then
+    replaced. The documents it lost are read again one at a time in a
+    worker of their own, so only the document that crashes that worker too
+    is written as failed (and --resume doesn't rerun it).
+    Returns counts of documents written, failed and skipped.
+    """
+    counts = {'written': 0, 'failed': 0, 'skipped': 0}
+    # Created before the pool forks so workers share its counters
+    get_cache()
+
+    def new_pool(alone):
+        return ProcessPoolExecutor(max_workers=1 if alone else workers, initializer=init_pool_worker)
+
+    # The shared pool, and the single worker reading documents lost to a crash
+    pools = {False: new_pool(False), True: new_pool(True)}
+    # Future -> (path, read alone); documents waiting to be read alone
+    pending = {}
+    lost = deque()
+
+    def submit(path, alone=False):
+        try:
+            future = pools[alone].submit(extract_document, path, lang_mode)
+        except BrokenProcessPool:
+            pools[alone].shutdown(wait=False, cancel_futures=True)
+            pools[alone] = new_pool(alone)
+            future = pools[alone].submit(extract_document, path, lang_mode)
+        pending[future] = path, alone
+
+    def drain():
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            path, alone = pending.pop(future)
+            try:
+                record = future.result()
+            except (BrokenProcessPool, CancelledError):
+                # Failed by the broken pool, or cancelled when it was shut down
+                if not alone:
+                    lost.append(path)
+                    continue
+                record = {'path': path, 'success': False,
+                          'error': 'BrokenProcessPool: a worker process crashed reading this document'}
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            out.flush()
+            counts['written'] += 1
+            counts['failed'] += not record['success']
+        if lost and not any(alone for _, alone in pending.values()):
+            submit(lost.popleft(), alone=True)
+
+    try:
+        for path in paths:
+            if path in skip:
+                counts['skipped'] += 1
+                continue
+            submit(path)
+            if len(pending) >= workers * QUEUE_PER_WORKER:
+                drain()
+        while pending or lost:
+            drain()
+    except KeyboardInterrupt:
+        # Every line written so far is complete, so --resume continues from here
+        for future in pending:
+            future.cancel()
+        raise
+    finally:
+        for pool in pools.values():
+            pool.shutdown()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Extract ID card information from many files in parallel')
+    parser.add_argument('inputs', nargs='+', help='files, directories, glob patterns or @file lists (@- for stdin)')
+    parser.add_argument('-o', '--output', help='append JSON lines here instead of writing to stdout')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('--lang', choices=sorted(LANG_MODES), help='OCR language mode')
+    parser.add_argument('--resume', action='store_true', help='skip documents already in --output')
+    parser.add_argument('--retry-failed', action='store_true', help='with --resume, read failed documents again')
+    args = parser.parse_args(argv)
+    if args.resume and not args.output:
+        parser.error('--resume needs --output')
+
+    # One Tesseract thread per document: the workers already fill every core
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+    skip = completed_paths(args.output, args.retry_failed) if args.resume else frozenset()
+    start = time.perf_counter()
+    out = open(args.output, 'a' if args.resume else 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        counts = run(iter_inputs(args.inputs), out, max(1, args.workers), args.lang, skip)
+    except KeyboardInterrupt:
+        print('Interrupted; rerun with --resume to continue', file=sys.stderr)
+        return 130
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    print(f"{counts['written']} documents ({counts['failed']} failed, {counts['skipped']} skipped) "
+          f"in {elapsed:.1f}s, {counts['written'] / elapsed if elapsed else 0:.2f}/s", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,379 @@
+"""Benchmark the ID card pipeline on synthetic cards.
+
+Run from the repository root:
+
+    python -m benchmarks.run --output results.jsonl
+    python -m benchmarks.run --baseline results.jsonl
+
+Each line of output is a JSON record: one ``run`` record describing the
+environment, then one record per benchmark with latency percentiles (ms),
+throughput and accuracy against the synthetic ground truth. The cards are
+generated (benchmarks.synthetic_cards), so the accuracy figures track
+regressions between runs rather than accuracy on real cards. With
+``--baseline`` every benchmark's p50 is compared with an earlier run and
+the exit status is 1 if any got slower than ``--tolerance`` allows.
+
+The ``presets`` benchmark reads the single-card samples with every
+ocr_config preset, reporting speed, field accuracy and the card number
+hit rate of each; the same caveat applies to its accuracy.
+
+The ``startup`` benchmark times cold imports of the app and the OCR
+modules in fresh interpreters (``python -X importtime``) and exits 1 when
+one exceeds its IMPORT_BUDGETS entry or imports a forbidden module.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+# Every repeat must run the pipeline, not read the result cache
+os.environ.setdefault('OCR_CACHE', '0')
+# Synthetic cards must never reach a real duplicate lookup store, nor its writes the timings
+os.environ['CARD_STORE'] = ''
+
+import app as webapp
+from identification import CARD_NUMBER_FIELDS, detect_id_card, extract_id_info
+from ocr_config import PRESETS
+from ocr_engine import get_engine
+
+from benchmarks.synthetic_cards import CARD_TEXT, generate_samples
+
+
+# Cold-start budgets: slowest acceptable cumulative import time (ms) and
+# heavy modules that must only be loaded once a request needs them
+HEAVY_MODULES = ['cv2', 'numpy', 'pytesseract', 'tesserocr', 'PIL', 'pdf2image', 'tkinter']
+IMPORT_BUDGETS = {
+    'identification': {'max_ms': 150, 'forbidden': HEAVY_MODULES},
+    'idcore': {'max_ms': 200, 'forbidden': HEAVY_MODULES},
+    'app': {'max_ms': 500, 'forbidden': HEAVY_MODULES},
+}
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(name, latencies, errors=0, correct=None, checked=None, **extra):
+    """Benchmark record from per-call latencies in seconds"""
+    ms = sorted(latency * 1000 for latency in latencies)
+    total = sum(latencies)
+    record = {
+        'type': 'benchmark',
+        'benchmark': name,
+        'calls': len(latencies),
+        'errors': errors,
+        'total_s': round(total, 4),
+        'mean_ms': round(statistics.fmean(ms), 4) if ms else None,
+        'p50_ms': round(percentile(ms, 0.5), 4) if ms else None,
+        'p95_ms': round(percentile(ms, 0.95), 4) if ms else None,
+        'max_ms': round(ms[-1], 4) if ms else None,
+        'throughput_per_s': round(len(latencies) / total, 2) if total else None,
+    }
+    if checked:
+        record['accuracy'] = round(correct / checked, 4)
+    record.update(extra)
+    return record
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def field_hits(truth, details):
+    """(fields matching the ground truth, fields expected) for one card"""
+    expected = truth['Details']
+    hits = 0
+    for field, value in expected.items():
+        got = (details.get(field) or '').replace(' ', '')
+        if field == 'Name':
+            hits += got.upper() == value.replace(' ', '').upper()
+        else:
+            hits += got == value.replace(' ', '')
+    return hits, len(expected)
+
+
+def card_text(truth):
+    """Clean OCR-like text for a card, as a perfect read would produce"""
+    details = truth['Details']
+    lines = list(CARD_TEXT[truth['ID Type']]['header'])
+    lines += [details['Name'], f"DOB: {details['Date of Birth']}", details[CARD_NUMBER_FIELDS[truth['ID Type']]]]
+    return '\n'.join(lines)
+
+
+def bench_detect(samples, repeat):
+    truths = [truth for sample in samples for truth in sample['truth']]
+    texts = [(card_text(truth), truth['ID Type']) for truth in truths]
+    latencies, correct = [], 0
+    for _ in range(repeat):
+        for text, id_type in texts:
+            detected, elapsed = timed(detect_id_card, text)
+            latencies.append(elapsed)
+            correct += detected == id_type
+    return summarize('detect_id_card', latencies, correct=correct, checked=len(latencies))
+
+
+def bench_compare(samples, repeat):
+    truths = [truth for sample in samples for truth in sample['truth']]
+    # Each card against itself (a match) and against the next card (no match)
+    pairs = []
+    for index, truth in enumerate(truths):
+        card = {'details': truth['Details']}
+        other = {'details': truths[(index + 1) % len(truths)]['Details']}
+        pairs.append((card, dict(card), 'match'))
+        if other['details']['Name'] != card['details']['Name']:
+            pairs.append((card, other, 'no_match'))
+    latencies = []
+    outcomes = {'match': {}, 'no_match': {}}
+    for _ in range(repeat):
+        for card1, card2, expected in pairs:
+            result, elapsed = timed(webapp.compare_id_info, card1, card2)
+            latencies.append(elapsed)
+            counts = outcomes[expected]
+            counts[result['overall_result']] = counts.get(result['overall_result'], 0) + 1
+    # Verdicts per expected outcome rather than one accuracy figure: two
+    # different people may legitimately share a birth date
+    return summarize('compare_id_info', latencies, outcomes=outcomes)
+
+
+def bench_extract(samples, repeat):
+    """extract_id_info on every single-card and multi-card page image"""
+    records = []
+    for kind in ('card', 'page'):
+        latencies, errors, hits, expected, first_error = [], 0, 0, 0, None
+        for _ in range(repeat):
+            for sample in samples:
+                if sample['kind'] != kind:
+                    continue
+                try:
+                    result, elapsed = timed(extract_id_info, sample['data'])
+                except Exception as e:
+                    errors += 1
+                    first_error = first_error or f'{type(e).__name__}: {e}'
+                    continue
+                latencies.append(elapsed)
+                # A page read whole yields at most one card's fields
+                card_hits, card_fields = field_hits(sample['truth'][0], result['Details'])
+                hits += card_hits
+                expected += card_fields
+        records.append(summarize(f'extract_id_info[{kind}]', latencies, errors, hits, expected,
+                                 first_error=first_error))
+    return records
+
+
+def bench_presets(samples, repeat):
+    """extract_id_info on the single-card images with each Tesseract preset"""
+    records = []
+    for preset in PRESETS:
+        latencies, errors, hits, expected, number_hits, numbers, first_error = [], 0, 0, 0, 0, 0, None
+        for _ in range(repeat):
+            for sample in samples:
+                if sample['kind'] != 'card':
+                    continue
+                try:
+                    result, elapsed = timed(extract_id_info, sample['data'], preset=preset)
+                except Exception as e:
+                    errors += 1
+                    first_error = first_error or f'{type(e).__name__}: {e}'
+                    continue
+                latencies.append(elapsed)
+                truth = sample['truth'][0]
+                card_hits, card_fields = field_hits(truth, result['Details'])
+                hits += card_hits
+                expected += card_fields
+                number_field = CARD_NUMBER_FIELDS[truth['ID Type']]
+                number_hits += field_hits({'Details': {number_field: truth['Details'][number_field]}},
+                                          result['Details'])[0]
+                numbers += 1
+        records.append(summarize(f'presets[{preset}]', latencies, errors, hits, expected,
+                                 number_accuracy=round(number_hits / numbers, 4) if numbers else None,
+                                 first_error=first_error))
+    return records
+
+
+def bench_upload(samples, repeat):
+    """POST every sample to /upload through the Flask test client"""
+    client = webapp.app.test_client()
+    records = []
+    for kind in ('card', 'page', 'pdf'):
+        latencies, errors, hits, expected, first_error = [], 0, 0, 0, None
+        for _ in range(repeat):
+            for sample in samples:
+                if sample['kind'] != kind:
+                    continue
+                start = time.perf_counter()
+                response = client.post('/upload', data=sample['data'],
+                                       headers={'Content-Type': 'application/octet-stream',
+                                                'X-Filename': sample['filename']})
+                elapsed = time.perf_counter() - start
+                body = response.get_json() or {}
+                if response.status_code != 200 or not body.get('success'):
+                    errors += 1
+                    first_error = first_error or body.get('error') or f'HTTP {response.status_code}'
+                    continue
+                latencies.append(elapsed)
+                cards = body.get('pages') or [body]
+                for truth, card in zip(sample['truth'], cards):
+                    card_hits, card_fields = field_hits(truth, card['details'])
+                    hits += card_hits
+                    expected += card_fields
+        records.append(summarize(f'upload[{kind}]', latencies, errors, hits, expected,
+                                 first_error=first_error))
+    return records
+
+
+def import_profile(module):
+    """Import a module in a fresh interpreter; return (wall seconds, import ms, top-level modules loaded)"""
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=REPO_ROOT,
+                               capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    import_ms = None
+    loaded = set()
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        loaded.add(name.strip().split('.')[0])
+        # The module itself is reported last, after everything it imported
+        if name.strip() == module:
+            import_ms = int(cumulative) / 1000
+    return wall, import_ms, loaded
+
+
+def bench_startup(samples, repeat):
+    """Cold-start time of each module in IMPORT_BUDGETS, checked against its budget"""
+    records = []
+    for module, budget in IMPORT_BUDGETS.items():
+        walls, imports, loaded = [], [], set()
+        for _ in range(repeat):
+            wall, import_ms, modules = import_profile(module)
+            walls.append(wall)
+            imports.append(import_ms)
+            loaded |= modules
+        import_ms = round(statistics.median(imports), 2)
+        forbidden = sorted(loaded & set(budget['forbidden']))
+        records.append(summarize(f'startup[{module}]', walls, import_ms=import_ms, budget_ms=budget['max_ms'],
+                                 forbidden_imports=forbidden,
+                                 within_budget=import_ms <= budget['max_ms'] and not forbidden))
+    return records
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_record(args):
+    try:
+        engine = get_engine().name
+    except Exception as e:
+        engine = f'unavailable ({e})'
+    return {
+        'type': 'run',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'ocr_engine': engine,
+        'seed': args.seed,
+        'cards': args.cards,
+        'pages': args.pages,
+        'pdf_pages': args.pdf_pages,
+        'repeat': args.repeat,
+    }
+
+
+def compare_with_baseline(records, baseline_path, tolerance):
+    """Return a message per benchmark whose p50 regressed beyond the tolerance"""
+    with open(baseline_path) as f:
+        baseline = {record['benchmark']: record for record in map(json.loads, filter(str.strip, f))
+                    if record.get('type') == 'benchmark'}
+    regressions = []
+    for record in records:
+        before = baseline.get(record['benchmark'])
+        if not before or not before.get('p50_ms') or record.get('p50_ms') is None:
+            continue
+        change = record['p50_ms'] / before['p50_ms'] - 1
+        if change > tolerance:
+            regressions.append(f"{record['benchmark']}: p50 {before['p50_ms']} ms -> {record['p50_ms']} ms "
+                               f"(+{change:.0%})")
+    return regressions
+
+
+BENCHMARKS = {
+    'detect': bench_detect,
+    'compare': bench_compare,
+    'extract': bench_extract,
+    'upload': bench_upload,
+    'presets': bench_presets,
+    'startup': bench_startup,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark ID card extraction on synthetic cards')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cards', type=int, default=10, help='single-card images to generate')
+    parser.add_argument('--pages', type=int, default=2, help='multi-card page images to generate')
+    parser.add_argument('--pdf-pages', type=int, default=2, help='pages in the generated PDF (0 for none)')
+    parser.add_argument('--repeat', type=int, default=1, help='passes over the OCR samples')
+    parser.add_argument('--fast-repeat', type=int, default=200,
+                        help='passes over the samples for detect and compare, which take microseconds')
+    parser.add_argument('--startup-repeat', type=int, default=5, help='fresh interpreters per startup measurement')
+    parser.add_argument('--only', choices=sorted(BENCHMARKS), action='append',
+                        help='run only these benchmarks (repeatable)')
+    parser.add_argument('--output', help='write JSON lines here instead of stdout')
+    parser.add_argument('--baseline', help='earlier output to compare p50 latencies against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed p50 slowdown against the baseline (0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    names = args.only or list(BENCHMARKS)
+    samples = generate_samples(args.seed, args.cards, args.pages, args.pdf_pages) if set(names) - {'startup'} else []
+    records = []
+    for name in names:
+        if name == 'startup':
+            repeat = args.startup_repeat
+        elif name in ('detect', 'compare'):
+            repeat = args.fast_repeat
+        else:
+            repeat = args.repeat
+        result = BENCHMARKS[name](samples, repeat)
+        records.extend(result if isinstance(result, list) else [result])
+
+    lines = [json.dumps(record) for record in [run_record(args)] + records]
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+    else:
+        print('\n'.join(lines))
+
+    failed = False
+    for record in records:
+        if record.get('within_budget') is False:
+            print(f"BUDGET {record['benchmark']}: {record['import_ms']} ms (budget {record['budget_ms']} ms), "
+                  f"forbidden imports: {record['forbidden_imports'] or 'none'}", file=sys.stderr)
+            failed = True
+    if args.baseline:
+        regressions = compare_with_baseline(records, args.baseline, args.tolerance)
+        for message in regressions:
+            print(f'REGRESSION {message}', file=sys.stderr)
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""Synthetic Indian ID cards with known contents, generated offline with PIL.
+
+Cards are drawn at their canonical 300 dpi size with every field placed
+around its card_layouts region, moved and resized at random (FIELD_JITTER,
+FONT_JITTER) the way print positions drift between real cards, so layout
+and full-card extraction both apply but the layout boxes are not simply
+measured against themselves. Accuracy on these cards is still no
+substitute for accuracy on real scans.
+Card numbers are ones identification.find_card_number recognises. Everything is driven by a seeded random.Random, so a seed
+always produces the same samples.
+"""
+import io
+import random
+import string
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from card_layouts import CARD_LAYOUTS, HEADER_BOX
+from identification import CARD_NUMBER_FIELDS, find_card_number
+from validators import verhoeff_check_digit
+
+CARD_DPI = 300
+ID1_SIZE = (1011, 638)
+ID3_SIZE = (1476, 1039)
+# A4 at 150 dpi, the usual office scanner setting for multi-card pages
+PAGE_DPI = 150
+PAGE_SIZE = (1240, 1754)
+# Largest shift of a field's text from its layout region, as a fraction of
+# the card's width and height, and largest relative change of its font size
+FIELD_JITTER = (0.04, 0.05)
+FONT_JITTER = 0.15
+
+FIRST_NAMES = ["Aarav", "Priya", "Rahul", "Ananya", "Vikram", "Sneha", "Arjun", "Kavya",
+               "Rohan", "Meera", "Karan", "Divya", "Amit", "Pooja", "Suresh", "Neha"]
+LAST_NAMES = ["Sharma", "Verma", "Gupta", "Patel", "Reddy", "Iyer", "Singh", "Nair",
+              "Mehta", "Kumar", "Joshi", "Rao", "Das", "Malhotra", "Chopra", "Bose"]
+STATE_CODES = ["MH", "DL", "KA", "TN", "UP", "GJ", "RJ", "WB", "KL", "HR"]
+
+# Header lines and per-field label for each card type
+CARD_TEXT = {
+    "Aadhaar Card": {
+        "header": ["GOVERNMENT OF INDIA", "UNIQUE IDENTIFICATION AUTHORITY OF INDIA"],
+        "labels": {"Name": "", "Date of Birth": "DOB: "},
+    },
+    "PAN Card": {
+        "header": ["INCOME TAX DEPARTMENT", "PERMANENT ACCOUNT NUMBER"],
+        "labels": {"Name": "", "Date of Birth": ""},
+    },
+    "Passport": {
+        "header": ["REPUBLIC OF INDIA", "PASSPORT"],
+        "labels": {"Name": "Name: ", "Date of Birth": "Date of Birth: "},
+    },
+    "Driving License": {
+        "header": ["DRIVING LICENCE", "TRANSPORT DEPARTMENT"],
+        "labels": {"Name": "Name: ", "Date of Birth": "DOB: "},
+    },
+    "Voter ID": {
+        "header": ["ELECTION COMMISSION OF INDIA", "ELECTORAL PHOTO IDENTITY CARD"],
+        "labels": {"Name": "Name: ", "Date of Birth": "Date of Birth: "},
+    },
+}
+ID_TYPES = list(CARD_TEXT)
+# Types photocopied together onto one page; passports are scanned as booklets
+ID1_TYPES = [id_type for id_type in ID_TYPES if id_type != "Passport"]
+
+
+def _font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 only has the fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+def _digits(rng, count):
+    return "".join(rng.choice(string.digits) for _ in range(count))
+
+
+def _letters(rng, count):
+    return "".join(rng.choice(string.ascii_uppercase) for _ in range(count))
+
+
+def card_number(id_type, rng):
+    """Return (printed, normalized) card numbers for an ID type"""
+    if id_type == "Aadhaar Card":
+        # The last digit is the Verhoeff check digit real Aadhaar numbers carry
+        digits = rng.choice("23456789") + _digits(rng, 10)
+        digits += verhoeff_check_digit(digits)
+        printed = " ".join(digits[i:i + 4] for i in range(0, 12, 4))
+    elif id_type == "PAN Card":
+        # Fourth character P: the holder is an individual
+        printed = _letters(rng, 3) + "P" + _letters(rng, 1) + _digits(rng, 4) + _letters(rng, 1)
+    elif id_type == "Passport":
+        printed = _letters(rng, 1) + _digits(rng, 7)
+    elif id_type == "Driving License":
+        printed = f"{rng.choice(STATE_CODES)}{_digits(rng, 2)} {_digits(rng, 11)} {_digits(rng, 4)}"
+    else:
+        printed = _letters(rng, 3) + _digits(rng, 7)
+    normalized = printed.replace(" ", "")
+    assert find_card_number(id_type, printed) == normalized, printed
+    return printed, normalized
+
+
+def random_person(rng):
+    """A name and DD/MM/YYYY date of birth"""
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    dob = f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1950, 2005)}"
+    return {"Name": name, "Date of Birth": dob}
+
+
+def card_truth(id_type, person, number):
+    """Expected extract_id_info type and details for a card"""
+    return {"ID Type": id_type, "Details": {**person, CARD_NUMBER_FIELDS[id_type]: number}}
+
+
+def _draw_lines(draw, box, size, lines, font_size, rng):
+    left, top, right, bottom = box
+    width, height = size
+    font_size = round(font_size * rng.uniform(1 - FONT_JITTER, 1 + FONT_JITTER))
+    x = int((left + rng.uniform(-FIELD_JITTER[0], FIELD_JITTER[0])) * width) + 10
+    line_height = int(font_size * 1.3)
+    y = int(((top + bottom) / 2 + rng.uniform(-FIELD_JITTER[1], FIELD_JITTER[1])) * height)
+    y -= line_height * len(lines) // 2
+    x, y = max(8, x), max(8, y)
+    font = _font(font_size)
+    for line in lines:
+        draw.text((x, y), line, fill=0, font=font)
+        y += line_height
+
+
+def draw_card(id_type, person, printed_number, rng):
+    """Render one upright card as a grayscale PIL image, its text placed with rng's jitter"""
+    size = ID3_SIZE if id_type == "Passport" else ID1_SIZE
+    width, height = size
+    img = Image.new("L", size, 235)
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, width - 1, height - 1), outline=40, width=6)
+
+    # Photo placeholder in the left margin no layout region reads
+    photo = (int(0.04 * width), int(0.30 * height), int(0.24 * width), int(0.75 * height))
+    draw.rectangle(photo, fill=170, outline=90, width=3)
+    cx, cy = (photo[0] + photo[2]) // 2, (photo[1] + photo[3]) // 2
+    draw.ellipse((cx - 45, cy - 70, cx + 45, cy + 40), fill=120)
+
+    text = CARD_TEXT[id_type]
+    font_size = height // 16
+    _draw_lines(draw, HEADER_BOX, size, text["header"], font_size, rng)
+    for field, region in CARD_LAYOUTS[id_type].items():
+        if field == CARD_NUMBER_FIELDS[id_type]:
+            value = printed_number
+        else:
+            value = text["labels"][field] + person[field]
+        _draw_lines(draw, region["box"], size, [value], font_size, rng)
+    img.info["dpi"] = (CARD_DPI, CARD_DPI)
+    return img
+
+
+def degrade(img, rng, scale=1.0, noise=0.0, angle=0.0):
+    """Rescale, add Gaussian noise (stddev in grey levels) and rotate an image"""
+    dpi = img.info.get("dpi", (CARD_DPI, CARD_DPI))[0] * scale
+    if scale != 1.0:
+        img = img.resize((round(img.width * scale), round(img.height * scale)), Image.Resampling.LANCZOS)
+    if noise:
+        pixels = np.asarray(img, dtype=np.float32)
+        noisy = np.random.default_rng(rng.getrandbits(32)).normal(0.0, noise, pixels.shape)
+        img = Image.fromarray(np.clip(pixels + noisy, 0, 255).astype(np.uint8))
+    if angle:
+        img = img.rotate(angle, resample=Image.Resampling.BICUBIC, expand=True, fillcolor=255)
+    img.info["dpi"] = (dpi, dpi)
+    return img
+
+
+def random_card(rng, id_type=None):
+    """Return (image, truth) for a random card"""
+    id_type = id_type or rng.choice(ID_TYPES)
+    person = random_person(rng)
+    printed, normalized = card_number(id_type, rng)
+    return draw_card(id_type, person, printed, rng), card_truth(id_type, person, normalized)
+
+
+def compose_page(cards, rng):
+    """Lay cards out on a white A4 page, two per row, at PAGE_DPI"""
+    page = Image.new("L", PAGE_SIZE, 255)
+    x, y, row_height = 60, 80, 0
+    for card in cards:
+        scale = PAGE_DPI / card.info.get("dpi", (CARD_DPI, CARD_DPI))[0]
+        card = card.resize((round(card.width * scale), round(card.height * scale)), Image.Resampling.LANCZOS)
+        if x + card.width > PAGE_SIZE[0] - 40:
+            x, y, row_height = 60, y + row_height + 80, 0
+        page.paste(card, (x + rng.randint(0, 20), y + rng.randint(0, 20)))
+        x += card.width + 80
+        row_height = max(row_height, card.height)
+    page.info["dpi"] = (PAGE_DPI, PAGE_DPI)
+    return page
+
+
+def encode(img, fmt="PNG"):
+    """Encode an image or list of page images (multi-page PDF) to bytes"""
+    pages = img if isinstance(img, list) else [img]
+    dpi = pages[0].info.get("dpi", (CARD_DPI, CARD_DPI))
+    buffer = io.BytesIO()
+    if fmt == "PDF":
+        pages[0].save(buffer, format="PDF", save_all=True, append_images=pages[1:], resolution=dpi[0])
+    elif fmt == "JPEG":
+        pages[0].save(buffer, format="JPEG", quality=90, dpi=dpi)
+    else:
+        pages[0].save(buffer, format=fmt, dpi=dpi)
+    return buffer.getvalue()
+
+
+def generate_samples(seed=0, count=10, pages=2, pdf_pages=2):
+    """Build the benchmark sample set.
+
+    Returns a list of dicts with ``name``, ``kind`` (card, page or pdf),
+    ``filename``, ``data`` (encoded bytes) and ``truth`` (one expected
+    result per card, in reading order). ``count`` single cards cycle
+    through every ID type with varied resolution, noise and rotation;
+    ``pages`` multi-card pages and one ``pdf_pages``-page PDF follow.
+    """
+    rng = random.Random(seed)
+    samples = []
+
+    # (scale, noise, angle) variants; scale 0.5 is a 150 dpi scan, 2.0 a 600 dpi one
+    variants = [(1.0, 0.0, 0.0), (0.5, 0.0, 0.0), (2.0, 0.0, 0.0), (1.0, 12.0, 0.0),
+                (1.0, 0.0, 2.5), (0.75, 8.0, -1.5)]
+    for index in range(count):
+        id_type = ID_TYPES[index % len(ID_TYPES)]
+        scale, noise, angle = variants[index % len(variants)]
+        card, truth = random_card(rng, id_type)
+        card = degrade(card, rng, scale, noise, angle)
+        fmt = "JPEG" if noise else "PNG"
+        samples.append({
+            "name": f"card-{index:03d}",
+            "kind": "card",
+            "variant": {"scale": scale, "noise": noise, "angle": angle},
+            "filename": f"card-{index:03d}.{fmt.lower()}",
+            "data": encode(card, fmt),
+            "truth": [truth]
+        })
+
+    def random_page():
+        cards = [random_card(rng, rng.choice(ID1_TYPES)) for _ in range(rng.randint(2, 4))]
+        return compose_page([card for card, _ in cards], rng), [truth for _, truth in cards]
+
+    for index in range(pages):
+        page, truths = random_page()
+        samples.append({
+            "name": f"page-{index:03d}",
+            "kind": "page",
+            "filename": f"page-{index:03d}.png",
+            "data": encode(page),
+            "truth": truths
+        })
+
+    if pdf_pages:
+        rendered = [random_page() for _ in range(pdf_pages)]
+        samples.append({
+            "name": "pdf-000",
+            "kind": "pdf",
+            "filename": "pdf-000.pdf",
+            "data": encode([page for page, _ in rendered], "PDF"),
+            "truth": [truth for _, truths in rendered for truth in truths]
+        })
+    return samples
@@ -0,0 +1,269 @@
+import io
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+
+from card_layouts import ID1_ASPECT_RATIO, ID3_ASPECT_RATIO, is_card_shaped
+from identification import extract_id_info, read_image_bytes
+from metrics import bind
+from preprocess import MAX_OCR_PIXELS
+
+FACE_CASCADE = 'haarcascade_frontalface_default.xml'
+
+# Detection runs on a copy whose longer side is at most this many pixels;
+# a card photo face on a full A4 page is still ~40 px at this size
+DETECT_MAX_SIDE = 1000
+
+# Expected card photo face size as a fraction of the image's longer side:
+# from a card on a full page (face ~6% of page width) up to a tight card
+# crop (face ~35% of card width)
+FACE_MIN_FRACTION = 0.03
+FACE_MAX_FRACTION = 0.4
+# Smallest window the Haar cascade was trained on
+CASCADE_MIN_SIZE = 24
+
+# Cards of one image read at once (idcore.init_pool_worker sets 1 in pool workers)
+CARD_WORKERS = int(os.environ.get('CARD_WORKERS', os.cpu_count() or 1))
+
+_local = threading.local()
+
+
+def get_face_detector():
+    """Return this thread's face cascade, loading it on first use.
+
+    CascadeClassifier isn't safe to share between threads, so each worker
+    thread keeps its own instead of reloading the XML on every call.
+    """
+    detector = getattr(_local, 'face_cascade', None)
+    if detector is None:
+        detector = cv2.CascadeClassifier(cv2.data.haarcascades + FACE_CASCADE)
+        _local.face_cascade = detector
+    return detector
+
+
+def detect_faces(gray, scale_factor=1.1, min_neighbors=5):
+    """Find card photo faces in a grayscale image array.
+
+    Detection runs on a downscaled copy with size bounds derived from card
+    geometry; boxes are returned as (x, y, w, h) in the coordinates of the
+    full-resolution input.
+    """
+    height, width = gray.shape[:2]
+    scale = min(1.0, DETECT_MAX_SIDE / max(height, width))
+    if scale < 1.0:
+        small = cv2.resize(gray, (max(1, round(width * scale)), max(1, round(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+    else:
+        small = gray
+
+    long_side = max(small.shape[:2])
+    min_size = max(CASCADE_MIN_SIZE, int(long_side * FACE_MIN_FRACTION))
+    max_size = max(min_size, int(long_side * FACE_MAX_FRACTION))
+    faces = get_face_detector().detectMultiScale(small, scaleFactor=scale_factor, minNeighbors=min_neighbors,
+                                                 minSize=(min_size, min_size), maxSize=(max_size, max_size))
+
+    boxes = []
+    for (x, y, w, h) in faces:
+        x0, y0 = int(x / scale), int(y / scale)
+        x1, y1 = min(width, int((x + w) / scale)), min(height, int((y + h) / scale))
+        boxes.append((x0, y0, x1 - x0, y1 - y0))
+    return boxes
+
+
+# Warped cards come out at these sizes: ID-1 and ID-3 (passport page) at 300 dpi
+CANONICAL_CARD_SIZE = (1011, 638)
+CANONICAL_PASSPORT_SIZE = (1476, 1039)
+
+# Segmentation runs on a copy whose longer side is at most this many pixels
+SEGMENT_MAX_SIDE = 1000
+# Smallest card accepted, as a fraction of the image area
+CARD_MIN_AREA_FRACTION = 0.02
+# Contours that aren't a clean quadrilateral must fill this much of their bounding rectangle
+CARD_MIN_FILL = 0.85
+# A single card quad covering this much of an image is the image itself: a
+# card cropped with its border
+FULL_FRAME_FRACTION = 0.8
+# Accepted relative deviation of a quad from a card aspect ratio; looser than
+# card_layouts.ASPECT_TOLERANCE since photographed cards are seen in perspective
+QUAD_ASPECT_TOLERANCE = 0.12
+
+
+def _order_corners(points):
+    """Order four (x, y) points as top-left, top-right, bottom-right, bottom-left"""
+    points = np.asarray(points, dtype=np.float32).reshape(4, 2)
+    sums = points.sum(axis=1)
+    diffs = np.diff(points, axis=1).ravel()
+    return np.array([points[np.argmin(sums)], points[np.argmin(diffs)],
+                     points[np.argmax(sums)], points[np.argmax(diffs)]], dtype=np.float32)
+
+
+def _card_size(quad):
+    """Canonical output size for an ordered quad, or None if it isn't card-shaped"""
+    top = np.linalg.norm(quad[1] - quad[0])
+    bottom = np.linalg.norm(quad[2] - quad[3])
+    left = np.linalg.norm(quad[3] - quad[0])
+    right = np.linalg.norm(quad[2] - quad[1])
+    long_side = max(top + bottom, left + right)
+    short_side = min(top + bottom, left + right)
+    if not short_side:
+        return None
+    ratio = long_side / short_side
+    for target, size in ((ID1_ASPECT_RATIO, CANONICAL_CARD_SIZE), (ID3_ASPECT_RATIO, CANONICAL_PASSPORT_SIZE)):
+        if abs(ratio - target) / target <= QUAD_ASPECT_TOLERANCE:
+            return size
+    return None
+
+
+def find_card_quads(gray):
+    """Find card-shaped quadrilaterals in a grayscale image array.
+
+    Edges are traced on a downscaled copy; each external contour that
+    simplifies to four corners (or nearly fills its rotated bounding box)
+    with a card or passport-page aspect ratio is kept. Returns a list of
+    (quad, canonical_size) with quad corners ordered top-left, top-right,
+    bottom-right, bottom-left in full-resolution coordinates, sorted in
+    reading order.
+    """
+    height, width = gray.shape[:2]
+    scale = min(1.0, SEGMENT_MAX_SIDE / max(height, width))
+    if scale < 1.0:
+        small = cv2.resize(gray, (max(1, round(width * scale)), max(1, round(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+    else:
+        small = gray
+
+    blurred = cv2.GaussianBlur(small, (5, 5), 0)
+    edges = cv2.Canny(blurred, 50, 150)
+    # Close small gaps in card borders so each card is one contour
+    edges = cv2.dilate(edges, np.ones((3, 3), np.uint8), iterations=2)
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    min_area = CARD_MIN_AREA_FRACTION * small.shape[0] * small.shape[1]
+    cards = []
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if area < min_area:
+            continue
+        approx = cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True)
+        if len(approx) == 4 and cv2.isContourConvex(approx):
+            corners = approx
+        else:
+            rect = cv2.minAreaRect(contour)
+            if area < CARD_MIN_FILL * rect[1][0] * rect[1][1]:
+                continue
+            corners = cv2.boxPoints(rect)
+        quad = _order_corners(corners) / scale
+        size = _card_size(quad)
+        if size is not None:
+            cards.append((quad, size))
+
+    # Reading order: rows top to bottom, then left to right within a row
+    row_height = max(1, height // 10)
+    cards.sort(key=lambda card: (int(card[0][:, 1].min() // row_height), card[0][:, 0].min()))
+    return cards
+
+
+def warp_card(image, quad, size):
+    """Perspective-correct a card quad into an upright, landscape image of the given size"""
+    width, height = size
+    # Portrait quads are turned so the card's long side is horizontal
+    if np.linalg.norm(quad[3] - quad[0]) > np.linalg.norm(quad[1] - quad[0]):
+        quad = np.roll(quad, -1, axis=0)
+    target = np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype=np.float32)
+    matrix = cv2.getPerspectiveTransform(quad.astype(np.float32), target)
+    return cv2.warpPerspective(image, matrix, (width, height), flags=cv2.INTER_AREA)
+
+
+def segment_cards(image):
+    """Return every card found in an image array, each warped to its canonical size"""
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return [warp_card(image, quad, size) for quad, size in find_card_quads(gray)]
+
+
+# Card around a detected photo face, in face widths/heights from the face box:
+# the photo sits at the left of the card and the text runs to its right
+FACE_CARD_MARGINS = (0.6, 1.5, 6.0, 3.0)  # left, top, right, bottom
+
+
+def card_box_from_face(face, image_shape):
+    """Estimate the (x, y, w, h) card region around a card photo face"""
+    x, y, w, h = face
+    left, top, right, bottom = FACE_CARD_MARGINS
+    x0, y0 = max(0, int(x - left * w)), max(0, int(y - top * h))
+    x1, y1 = min(image_shape[1], int(x + right * w)), min(image_shape[0], int(y + bottom * h))
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def face_crops(image):
+    """Estimated card regions around each card photo face in an image array"""
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    crops = []
+    for face in detect_faces(gray):
+        x, y, w, h = card_box_from_face(face, image.shape)
+        crops.append(image[y:y+h, x:x+w])
+    return crops
+
+
+def read_crops(crops, workers=None, **options):
+    """OCR card crops (image arrays) in parallel, numbering the results from 1"""
+    crops = [Image.fromarray(crop if crop.ndim == 2 else cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
+             for crop in crops]
+    if not crops:
+        return []
+    with ThreadPoolExecutor(max_workers=workers or min(len(crops), CARD_WORKERS)) as pool:
+        results = list(pool.map(bind(lambda crop: extract_id_info(crop, **options)), crops))
+    for index, result in enumerate(results, 1):
+        result["Card"] = index
+    return results
+
+
+def extract_cards(image, workers=None, **options):
+    """Segment an image array into cards and OCR them in parallel.
+
+    Card outlines are used when visible; otherwise, e.g. white cards on a
+    white scanner bed, each card photo face anchors an estimated card
+    region. ``options`` are passed to extract_id_info. Returns one result
+    per card, in reading order, with a 1-based "Card" index; an empty list
+    when no card is found.
+    """
+    return read_crops(segment_cards(image) or face_crops(image), workers, **options)
+
+
+def covers_frame(quad, shape):
+    """True if a card quad is most of an image of the given array shape"""
+    return cv2.contourArea(quad) >= FULL_FRAME_FRACTION * shape[0] * shape[1]
+
+
+def extract_image_info(source, **options):
+    """Read every card in an image file (path, bytes or binary file object).
+
+    Card outlines are always looked for, since a phone photo or a scanned
+    page can have any aspect ratio. The image is read as it is when it is
+    a single card: one outline covering most of it, or no outline and a
+    card's aspect ratio. Otherwise each outlined card (or, without outlines,
+    each card photo face) is read separately, and the image is read whole
+    only when no card is found. ``options`` are passed to extract_id_info.
+    Returns one result per card.
+    """
+    data = read_image_bytes(source)
+    img = Image.open(io.BytesIO(data))
+    # Segmentation needs no more pixels than OCR does
+    scale = min(1.0, math.sqrt(MAX_OCR_PIXELS / (img.size[0] * img.size[1])))
+    img.draft('L', (round(img.size[0] * scale), round(img.size[1] * scale)))
+    page = np.asarray(ImageOps.exif_transpose(img).convert('L'))
+    quads = find_card_quads(page)
+    if len(quads) == 1 and covers_frame(quads[0][0], page.shape):
+        crops = []
+    elif quads:
+        crops = [warp_card(page, quad, size) for quad, size in quads]
+    elif is_card_shaped(page.shape[::-1]):
+        crops = []
+    else:
+        crops = face_crops(page)
+    results = read_crops(crops, **options)
+    return results or [extract_id_info(data, **options)]
@@ -0,0 +1,72 @@
+# Field layouts of upright, tightly cropped ID cards, used to OCR only the
+# regions that hold text we extract instead of the whole card.
+#
+# Boxes are (left, top, right, bottom) as fractions of the card's width and
+# height, padded generously since print positions drift between card
+# revisions and crops. They were measured on sample cards and are meant to
+# be tuned; extraction falls back to a full-card pass when a region misses.
+
+# ID-1 (85.60 x 53.98 mm) cards: Aadhaar, PAN, DL, Voter ID
+ID1_ASPECT_RATIO = 85.60 / 53.98
+# ID-3 (125 x 88 mm) passport data page
+ID3_ASPECT_RATIO = 125 / 88
+# Accepted relative deviation of an image from a card aspect ratio: enough
+# for a crop around a card skewed by a few degrees, but short of 4:3 and 3:2
+# photos. A landscape A4 page still has the passport page's ratio, so callers
+# that may get whole pages don't rely on this alone (see estimate_dpi and
+# card_detect.extract_image_info)
+ASPECT_TOLERANCE = 0.05
+
+# Band across the top of every card carrying the issuer's name, used to
+# classify the card before any field is read
+HEADER_BOX = (0.0, 0.0, 1.0, 0.25)
+
+# Per ID type: field name -> region of the field, and "hindi" for regions
+# where Hindi is printed beside the English (the name and its label), which
+# are read with Hindi on eng+hin passes. Other regions only ever hold Latin
+# text and are always read in English. The Tesseract settings of each field
+# come from ocr_config
+CARD_LAYOUTS = {
+    "Aadhaar Card": {
+        "Name": {"box": (0.28, 0.22, 0.98, 0.45), "hindi": True},
+        "Date of Birth": {"box": (0.28, 0.40, 0.98, 0.60)},
+        "Aadhaar Number": {"box": (0.15, 0.72, 0.85, 0.95)},
+    },
+    "PAN Card": {
+        "PAN Number": {"box": (0.02, 0.20, 0.65, 0.42)},
+        "Name": {"box": (0.02, 0.38, 0.75, 0.58), "hindi": True},
+        "Date of Birth": {"box": (0.02, 0.62, 0.60, 0.85)},
+    },
+    "Passport": {
+        "Passport Number": {"box": (0.65, 0.08, 0.99, 0.24)},
+        "Name": {"box": (0.28, 0.18, 0.75, 0.42), "hindi": True},
+        "Date of Birth": {"box": (0.28, 0.40, 0.99, 0.60)},
+    },
+    "Driving License": {
+        "DL Number": {"box": (0.02, 0.18, 0.80, 0.34)},
+        "Name": {"box": (0.25, 0.30, 0.99, 0.48), "hindi": True},
+        "Date of Birth": {"box": (0.25, 0.44, 0.99, 0.62)},
+    },
+    "Voter ID": {
+        "Voter ID Number": {"box": (0.35, 0.15, 0.99, 0.32)},
+        "Name": {"box": (0.28, 0.45, 0.99, 0.65), "hindi": True},
+        "Date of Birth": {"box": (0.28, 0.70, 0.99, 0.90)},
+    },
+}
+
+
+def is_card_shaped(size):
+    """True if a (width, height) looks like an upright card or passport page"""
+    width, height = size
+    if not width or not height:
+        return False
+    ratio = width / height
+    return any(abs(ratio - target) / target <= ASPECT_TOLERANCE
+               for target in (ID1_ASPECT_RATIO, ID3_ASPECT_RATIO))
+
+
+def crop_region(img, box):
+    """Crop a PIL image to a fractional (left, top, right, bottom) box"""
+    width, height = img.size
+    left, top, right, bottom = box
+    return img.crop((int(left * width), int(top * height), int(right * width), int(bottom * height)))
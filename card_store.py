@@ -0,0 +1,162 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from clustering import identity_keys
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cards (
+    id INTEGER PRIMARY KEY,
+    submitted_at REAL NOT NULL,
+    filename TEXT,
+    id_type TEXT,
+    number_key TEXT,
+    dob_key TEXT,
+    name_key TEXT,
+    details TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cards_number ON cards (number_key) WHERE number_key IS NOT NULL;
+CREATE INDEX IF NOT EXISTS cards_person ON cards (dob_key, name_key) WHERE dob_key IS NOT NULL;
+CREATE INDEX IF NOT EXISTS cards_name ON cards (name_key) WHERE name_key IS NOT NULL;
+"""
+
+# Rows returned per lookup
+LOOKUP_LIMIT = 20
+# Rows sharing a name are counted up to this many, so a common name can't slow lookups
+NAME_COUNT_LIMIT = 1000
+
+
+class CardStore:
+    """SQLite index of every card extracted, for duplicate lookups.
+
+    Each card is stored with the normalized card number, date of birth and
+    name key used by clustering, each indexed, so "has this card or person
+    been seen before" is a few index probes however many rows there are.
+    Connections are per thread and per process; WAL mode lets the OCR pool
+    workers write while the web process reads.
+
+    The store holds card numbers, names and dates of birth, so a new store
+    file is created readable by its owner only (SQLite gives its WAL files
+    the same permissions) in a directory only the owner can enter.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def add_many(self, cards, filename=None):
+        """Store extract_id_info results or web card summaries in one transaction.
+
+        Cards without a number, date of birth or name are skipped. Returns
+        the number of cards stored.
+        """
+        now = time.time()
+        rows = []
+        for card in cards:
+            number, dob, name = identity_keys(card)
+            # Nothing to look a card up by
+            if not (number or dob or name):
+                continue
+            details = card.get('Details') or card.get('details') or {}
+            id_type = card.get('ID Type') or card.get('id_type')
+            rows.append((now, filename, id_type, number, dob, name, json.dumps(details)))
+        with self._connect() as conn:
+            conn.executemany('INSERT INTO cards (submitted_at, filename, id_type, number_key, dob_key, name_key, '
+                             'details) VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        return len(rows)
+
+    def seen(self, card):
+        """Whether a card (card_seen) or the person on it (person_seen) is already stored"""
+        number, dob, name = identity_keys(card)
+        conn = self._connect()
+        card_seen = bool(number) and conn.execute('SELECT 1 FROM cards WHERE number_key = ? LIMIT 1',
+                                                   (number,)).fetchone() is not None
+        person_seen = bool(dob and name) and conn.execute(
+            'SELECT 1 FROM cards WHERE dob_key = ? AND name_key = ? LIMIT 1', (dob, name)).fetchone() is not None
+        return {'card_seen': card_seen, 'person_seen': person_seen}
+
+    def lookup(self, card, limit=LOOKUP_LIMIT):
+        """Find earlier submissions of a card or of the person on it.
+
+        ``card`` is an extract_id_info result or a web card summary. Returns
+        ``card_seen`` (same card number), ``person_seen`` (same date of
+        birth and name) and up to ``limit`` matching rows per kind, newest
+        first, plus the count of rows sharing the name (capped at
+        NAME_COUNT_LIMIT).
+        """
+        number, dob, name = identity_keys(card)
+        conn = self._connect()
+        columns = 'id, submitted_at, filename, id_type, details'
+        result = {
+            'keys': {'card_number': number, 'date_of_birth': dob, 'name': name},
+            'card_seen': False,
+            'person_seen': False,
+            'same_card': [],
+            'same_person': [],
+            'same_name_count': 0
+        }
+        if number:
+            rows = conn.execute(f'SELECT {columns} FROM cards WHERE number_key = ? ORDER BY id DESC LIMIT ?',
+                                (number, limit)).fetchall()
+            result['same_card'] = [_row(row) for row in rows]
+            result['card_seen'] = bool(rows)
+        if dob and name:
+            rows = conn.execute(f'SELECT {columns} FROM cards WHERE dob_key = ? AND name_key = ? '
+                                'ORDER BY id DESC LIMIT ?', (dob, name, limit)).fetchall()
+            result['same_person'] = [_row(row) for row in rows]
+            result['person_seen'] = bool(rows)
+        if name:
+            result['same_name_count'] = conn.execute(
+                'SELECT COUNT(*) FROM (SELECT 1 FROM cards WHERE name_key = ? LIMIT ?)',
+                (name, NAME_COUNT_LIMIT)).fetchone()[0]
+        return result
+
+    def count(self):
+        return self._connect().execute('SELECT COUNT(*) FROM cards').fetchone()[0]
+
+
+def _row(row):
+    card_id, submitted_at, filename, id_type, details = row
+    return {
+        'id': card_id,
+        'submitted_at': submitted_at,
+        'filename': filename,
+        'id_type': id_type,
+        'details': json.loads(details)
+    }
+
+
+_store = None
+_configured = False
+
+
+def get_card_store():
+    """Return the process-wide card store, or None when disabled.
+
+    The store is off unless ``CARD_STORE`` names its SQLite file.
+    """
+    global _store, _configured
+    if not _configured:
+        path = os.environ.get('CARD_STORE')
+        if path:
+            _store = CardStore(path)
+        _configured = True
+    return _store
@@ -0,0 +1,226 @@
+import re
+from datetime import datetime
+
+from identification import CARD_NUMBER_FIELDS
+
+# Details keys that may hold a card number: identification's per-type keys
+# and the GUI's generic one
+NUMBER_FIELDS = list(CARD_NUMBER_FIELDS.values()) + ["Card Number"]
+
+DATE_FORMATS = [
+    "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%Y/%m/%d", "%Y-%m-%d",
+    "%d %B %Y", "%d %b %Y", "%B %d %Y", "%b %d %Y",  # Month names
+    "%d/%m/%y", "%d-%m-%y", "%y/%m/%d", "%y-%m-%d"   # 2-digit years
+]
+
+
+def standardize_date(date_str):
+    """Return a date as DD/MM/YYYY, or the input when it can't be parsed"""
+    if not date_str:
+        return None
+
+    # Try parsing with datetime
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str, fmt).strftime("%d/%m/%Y")
+        except ValueError:
+            continue
+
+    # If all parsing fails, try to extract numbers and reconstruct
+    numbers = re.findall(r'\d+', date_str)
+    if len(numbers) >= 3:
+        day = numbers[0].zfill(2)
+        month = numbers[1].zfill(2)
+        year = numbers[2]
+        if len(year) == 2:
+            year = '19' + year if int(year) > 50 else '20' + year
+        return f"{day}/{month}/{year}"
+
+    return date_str
+
+
+def identity_keys(info):
+    """Normalized (card number, date of birth, name) of one card; missing fields are None.
+
+    Accepts extract_id_info results ("Details") and web summaries
+    ("details"). Names are upper-cased with their words sorted, so
+    "SHARMA AARAV" and "Aarav Sharma" share a key.
+    """
+    details = info.get("Details") or info.get("details") or {}
+    number = next((details[field] for field in NUMBER_FIELDS if details.get(field)), None)
+    if number:
+        number = re.sub(r"[^A-Z0-9]", "", str(number).upper()) or None
+    dob = standardize_date(details.get("Date of Birth"))
+    name = details.get("Name")
+    if name:
+        name = " ".join(sorted(re.sub(r"[^A-Z\s]", " ", str(name).upper()).split())) or None
+    return number, dob, name
+
+
+def number_field(info):
+    """Details key holding a card's number ("Aadhaar Number", ...), or None"""
+    details = info.get("Details") or info.get("details") or {}
+    return next((field for field in NUMBER_FIELDS if details.get(field)), None)
+
+
+def compare_keys(keys1, keys2, field1=None, field2=None):
+    """Per-field evidence for two cards' identity keys; field1 and field2 are their number_field"""
+    number1, dob1, name1 = keys1
+    number2, dob2, name2 = keys2
+    return {
+        'card_match': bool(number1 and number1 == number2),
+        'dob_match': bool(dob1 and dob1 == dob2),
+        'name_match': bool(name1 and name1 == name2),
+        # A field both cards carry with different values
+        'name_conflict': bool(name1 and name2 and name1 != name2),
+        # Two cards of the same type with different numbers are two different cards
+        'number_conflict': bool(number1 and number2 and field1 == field2 and number1 != number2),
+    }
+
+
+def _is_same_person(evidence):
+    # Same card number, or same birth date without conflicting names or numbers
+    return evidence['card_match'] or (evidence['dob_match'] and not evidence['name_conflict']
+                                      and not evidence['number_conflict'])
+
+
+def cluster_identities(infos):
+    """Group cards that belong to the same person.
+
+    Cards are blocked on their normalized card number, date of birth and
+    name, and only cards sharing a block are compared. Within a block every
+    card is compared with one representative instead of with every other
+    card, so the work grows with the number of cards rather than its
+    square. Cards with the same number, or the same date of birth and
+    neither a conflicting name nor a different number of the same card
+    type, are joined (a card without a name only joins when every named
+    card with its birth date agrees on the name); groups only sharing a
+    name, or a date of birth under a different name or number, are
+    reported as possible links. Two groups are never joined when any of
+    their members conflict on a card type's number, or, unless they share
+    a card number, on the name, whichever member the comparison went
+    through.
+
+    Returns a dict with ``groups`` (each with its card ``indices`` and the
+    ``links`` that joined them), ``possible_links`` between groups, and
+    the number of ``comparisons`` made. Every link carries the two card
+    indices and per-field evidence (card_match, dob_match, name_match,
+    name_conflict, number_conflict).
+    """
+    keys = [identity_keys(info) for info in infos]
+    fields = [number_field(info) for info in infos]
+    parent = list(range(len(infos)))
+
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    links = []
+    # Pair -> link; each pair is compared once
+    compared = {}
+
+    def compare(i, j):
+        pair = (min(i, j), max(i, j))
+        if pair not in compared:
+            evidence = compare_keys(keys[pair[0]], keys[pair[1]], fields[pair[0]], fields[pair[1]])
+            compared[pair] = {'indices': list(pair), **evidence}
+        return compared[pair]
+
+    by_number, by_dob_name, by_dob, by_name = {}, {}, {}, {}
+    for index, (number, dob, name) in enumerate(keys):
+        if number:
+            by_number.setdefault(number, []).append(index)
+        if dob and name:
+            by_dob_name.setdefault((dob, name), []).append(index)
+        if dob:
+            by_dob.setdefault(dob, []).append(index)
+        if name:
+            by_name.setdefault(name, []).append(index)
+
+    # Root -> {number field: numbers} and names of its group, so a group
+    # never takes in a card whose number or name conflicts with any member
+    group_numbers = [{field: {key[0]}} if field and key[0] else {} for key, field in zip(keys, fields)]
+    group_names = [{key[2]} if key[2] else set() for key in keys]
+
+    def groups_conflict(root1, root2, card_match):
+        numbers1, numbers2 = group_numbers[root1], group_numbers[root2]
+        if any(numbers1[field].isdisjoint(numbers2[field]) for field in numbers1.keys() & numbers2.keys()):
+            return True
+        # A shared card number outweighs a misread name
+        names1, names2 = group_names[root1], group_names[root2]
+        return not card_match and bool(names1 and names2 and names1.isdisjoint(names2))
+
+    def join(i, j):
+        link = compare(i, j)
+        root1, root2 = find(i), find(j)
+        if root1 == root2 or not _is_same_person(link) or groups_conflict(root1, root2, link['card_match']):
+            return
+        links.append(link)
+        parent[root1] = root2
+        for field, numbers in group_numbers[root1].items():
+            group_numbers[root2].setdefault(field, set()).update(numbers)
+        group_names[root2] |= group_names[root1]
+
+    # Blocks whose members are all the same person: a star around the first card
+    for block in list(by_number.values()) + list(by_dob_name.values()):
+        for index in block[1:]:
+            join(block[0], index)
+
+    # Cards with a birth date but no name join each other, and the named
+    # cards sharing that date when they all carry the same name
+    for block in by_dob.values():
+        nameless = [index for index in block if keys[index][2] is None]
+        for index in nameless[1:]:
+            join(nameless[0], index)
+        anchors = {}
+        for index in block:
+            if keys[index][2] is not None:
+                anchors.setdefault(keys[index][2], index)
+        if nameless and len(anchors) == 1:
+            join(next(iter(anchors.values())), nameless[0])
+
+    # Other groups sharing a date of birth or a name are possible links,
+    # each reported against the block's first group
+    possible = []
+    linked_groups = set()
+    for block in list(by_dob.values()) + list(by_name.values()):
+        representatives = {}
+        for index in block:
+            representatives.setdefault(find(index), index)
+        if len(representatives) < 2:
+            continue
+        roots = iter(representatives)
+        first = next(roots)
+        for root in roots:
+            pair = (min(first, root), max(first, root))
+            if pair in linked_groups:
+                continue
+            linked_groups.add(pair)
+            possible.append(compare(representatives[first], representatives[root]))
+
+    members = {}
+    for index in range(len(infos)):
+        members.setdefault(find(index), []).append(index)
+    group_of = {root: position for position, root in enumerate(members)}
+    groups = [{'indices': indices, 'links': []} for indices in members.values()]
+    for link in links:
+        groups[group_of[find(link['indices'][0])]]['links'].append(link)
+
+    return {
+        'groups': groups,
+        'possible_links': possible,
+        'comparisons': len(compared),
+    }
+
+
+def overall_result(clusters):
+    """'match' when every card is in one group, 'partial' when some cards are
+    grouped or possibly linked, otherwise 'no_match'"""
+    groups = clusters['groups']
+    if len(groups) == 1 and len(groups[0]['indices']) > 1:
+        return "match"
+    if clusters['possible_links'] or any(len(group['indices']) > 1 for group in groups):
+        return "partial"
+    return "no_match"
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from clustering import identity_keys
+
+# Fields scored, in the order of identity_keys, with their weight in the overall score
+FIELDS = ["Card Number", "Date of Birth", "Name"]
+FIELD_WEIGHTS = {"Card Number": 0.4, "Date of Birth": 0.3, "Name": 0.3}
+# Padding code for candidate positions past the end of a string; never equals a character
+_PAD = -1
+# The score matrices are as wide as the longest key, so keys are cut to
+# MAX_KEY_LENGTH characters (far more than any name or number needs), and
+# callers reject raw field values longer than MAX_FIELD_LENGTH
+MAX_KEY_LENGTH = 64
+MAX_FIELD_LENGTH = 256
+
+
+def _codes(text):
+    return np.frombuffer(text.encode('utf-32-le'), dtype=np.int32)
+
+
+def encode_strings(strings):
+    """Pack strings into a padded (N, longest) code matrix and their lengths"""
+    lengths = np.array([len(s) for s in strings], dtype=np.int32)
+    matrix = np.full((len(strings), max(1, int(lengths.max(initial=0)))), _PAD, dtype=np.int32)
+    for row, s in enumerate(strings):
+        if s:
+            matrix[row, :len(s)] = _codes(s)
+    return matrix, lengths
+
+
+def levenshtein_many(query, matrix, lengths):
+    """Edit distance from one string to every encoded candidate at once.
+
+    Runs the Wagner-Fischer recurrence one query character at a time over
+    all candidates and all of their positions as array operations; the
+    insertion chain along a row is a running minimum, so no step loops
+    over candidates or candidate positions in Python.
+    """
+    count, width = matrix.shape
+    positions = np.arange(width + 1, dtype=np.int32)
+    previous = np.broadcast_to(positions, (count, width + 1)).copy()
+    current = np.empty_like(previous)
+    for i, code in enumerate(_codes(query), 1):
+        current[:, 0] = i
+        # Substitution (or match) and deletion
+        np.minimum(previous[:, :-1] + (matrix != code), previous[:, 1:] + 1, out=current[:, 1:])
+        # Insertion: current[j] = min over k <= j of current[k] + (j - k)
+        current -= positions
+        np.minimum.accumulate(current, axis=1, out=current)
+        current += positions
+        previous, current = current, previous
+    return previous[np.arange(count), lengths]
+
+
+def similarity_many(query, matrix, lengths):
+    """1 - normalized edit distance from the query to each candidate; 0 where either is empty"""
+    if not query:
+        return np.zeros(len(lengths))
+    distances = levenshtein_many(query, matrix, lengths)
+    longest = np.maximum(lengths, len(query))
+    scores = 1.0 - distances / np.maximum(longest, 1)
+    scores[lengths == 0] = 0.0
+    return scores
+
+
+def token_similarity_many(query, token_sets):
+    """Jaccard similarity of the query's words with each candidate's words"""
+    words = set(query.split())
+    if not words:
+        return np.zeros(len(token_sets))
+    return np.array([len(words & tokens) / len(words | tokens) if tokens else 0.0 for tokens in token_sets])
+
+
+def comparison_keys(card):
+    """(card number, date of birth digits, name) keys used for fuzzy scoring"""
+    number, dob, name = identity_keys(card)
+    return ((number or "")[:MAX_KEY_LENGTH], re.sub(r"\D", "", dob or "")[:MAX_KEY_LENGTH],
+            (name or "")[:MAX_KEY_LENGTH])
+
+
+def oversized_fields(card):
+    """Detail fields of a card whose value is longer than MAX_FIELD_LENGTH"""
+    details = card.get("Details") or card.get("details") or {}
+    return [field for field, value in details.items() if len(str(value)) > MAX_FIELD_LENGTH]
+
+
+class CandidateIndex:
+    """Normalized, encoded fields of many records for one-to-many comparison.
+
+    Records are extract_id_info results or web card summaries. Build it
+    once per watchlist and call ``rank`` for each query card.
+    """
+
+    def __init__(self, records):
+        self.records = records
+        keys = [comparison_keys(record) for record in records]
+        self.values = {field: [key[position] for key in keys] for position, field in enumerate(FIELDS)}
+        self.encoded = {field: encode_strings(values) for field, values in self.values.items()}
+        self.name_tokens = [set(name.split()) for name in self.values["Name"]]
+
+    def __len__(self):
+        return len(self.records)
+
+    def score(self, card):
+        """Per-field and overall similarity of a card to every record.
+
+        Returns (overall, {field: scores}) as arrays in record order. Names
+        score the better of edit-distance and word-overlap similarity, so
+        reordered or missing words still count. The overall score is the
+        weighted mean over the fields both the card and the record carry.
+        """
+        query = dict(zip(FIELDS, comparison_keys(card)))
+        field_scores = {}
+        weighted = np.zeros(len(self))
+        weights = np.zeros(len(self))
+        for field in FIELDS:
+            matrix, lengths = self.encoded[field]
+            scores = similarity_many(query[field], matrix, lengths)
+            if field == "Name":
+                scores = np.maximum(scores, token_similarity_many(query[field], self.name_tokens))
+            field_scores[field] = scores
+            if query[field]:
+                present = lengths > 0
+                weighted += np.where(present, scores * FIELD_WEIGHTS[field], 0.0)
+                weights += np.where(present, FIELD_WEIGHTS[field], 0.0)
+        overall = np.divide(weighted, weights, out=np.zeros(len(self)), where=weights > 0)
+        return overall, field_scores
+
+    def rank(self, card, limit=20, min_score=0.0):
+        """Best matching records for a card, highest overall score first.
+
+        A field's score is None when the card or the record lacks it.
+        """
+        overall, field_scores = self.score(card)
+        query = dict(zip(FIELDS, comparison_keys(card)))
+        order = np.argsort(-overall, kind='stable')
+        order = order[overall[order] >= min_score][:limit]
+        return [{
+            'index': int(index),
+            'score': round(float(overall[index]), 4),
+            'fields': {field: {'score': round(float(field_scores[field][index]), 4)
+                                        if query[field] and self.values[field][index] else None,
+                               'value': self.values[field][index] or None}
+                       for field in FIELDS},
+        } for index in order]
+
+
+# Watchlists whose CandidateIndex is kept between requests
+INDEX_CACHE_ENTRIES = 8
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_index(records):
+    """CandidateIndex of a list of records, reused while the same watchlist keeps being sent.
+
+    Watchlists are keyed by a hash of their JSON, which costs a fraction of
+    normalizing and encoding them again; the INDEX_CACHE_ENTRIES most
+    recently used are kept.
+    """
+    key = hashlib.sha256(json.dumps(records, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+    index = CandidateIndex(records)
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > INDEX_CACHE_ENTRIES:
+            _indexes.popitem(last=False)
+    return index
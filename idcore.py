@@ -0,0 +1,139 @@
+"""Headless ID card core shared by the web app, both GUIs and batch workers.
+
+Extraction, classification, date standardization and comparison in one
+import that never pulls in tkinter or needs a display.
+"""
+import importlib
+import os
+import re
+import sys
+
+from clustering import NUMBER_FIELDS, cluster_identities, overall_result, standardize_date
+from identification import (CARD_NUMBER_FIELDS, LANG_MODES, UNKNOWN_ID_TYPE, classify_id_card, detect_id_card,
+                            extract_id_info, parse_id_text)
+from pdf_ingest import extract_pdf_info, is_pdf, map_pages
+
+__all__ = [
+    'CARD_NUMBER_FIELDS', 'LANG_MODES', 'UNKNOWN_ID_TYPE',
+    'extract_id_info', 'extract_cards', 'extract_image_info', 'extract_pdf_info', 'map_pages', 'is_pdf',
+    'parse_id_text',
+    'classify_id_card', 'detect_id_card',
+    'standardize_date',
+    'card_details', 'card_number', 'compare_id_info', 'cluster_identities', 'overall_result',
+    'init_pool_worker',
+]
+
+
+# Exports whose modules are heavy to import (OpenCV), loaded on first access
+_LAZY_EXPORTS = {'extract_cards': 'card_detect', 'extract_image_info': 'card_detect'}
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        value = getattr(importlib.import_module(_LAZY_EXPORTS[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def init_pool_worker():
+    """Initializer of process pools whose workers each read a whole document.
+
+    The pool already keeps every core busy with a document, so each worker
+    reads the pages of a PDF and the cards on a page one at a time instead
+    of on thread pools sized for the whole machine.
+    """
+    os.environ['PDF_PAGE_WINDOW'] = os.environ['CARD_WORKERS'] = '1'
+    # Modules imported before the pool forked have already read those settings
+    for module, setting in (('pdf_ingest', 'PAGE_WINDOW'), ('card_detect', 'CARD_WORKERS')):
+        if module in sys.modules:
+            setattr(sys.modules[module], setting, 1)
+
+
+def card_details(info):
+    """Details of an extract_id_info result ("Details") or a web card summary ("details")"""
+    return info.get('Details') or info.get('details') or {}
+
+
+def card_number(details):
+    """The card number from a details dict, whatever the card type, or None"""
+    return next((details[field] for field in NUMBER_FIELDS if details.get(field)), None)
+
+
+def clean_value(value):
+    """Upper-cased letters, spaces and dots of a name"""
+    if not value:
+        return ""
+    cleaned = ' '.join(str(value).strip().upper().split())
+    cleaned = re.sub(r'[^A-Z\s\.]', '', cleaned)
+    return cleaned
+
+
+def normalize_field(field, value):
+    """Comparable form of a details value: names cleaned, dates as DD/MM/YYYY, numbers alphanumeric"""
+    if not value:
+        return ""
+    if field == 'Name':
+        return clean_value(value)
+    if field == 'Date of Birth':
+        return standardize_date(str(value).strip()) or ""
+    return re.sub(r'[^A-Z0-9]', '', str(value).upper())
+
+
+def compare_id_info(info1, info2):
+    """Compare two ID card information sets.
+
+    Accepts extract_id_info results or web card summaries. Names, dates of
+    birth (in any supported format) and every other field both cards carry
+    are compared after normalization; ``card_match`` is set when both
+    carry the same card number field with the same value.
+    """
+    details1 = card_details(info1)
+    details2 = card_details(info2)
+    comparison = {
+        'name_match': False,
+        'dob_match': False,
+        'card_match': False,
+        'total_fields': 0,
+        'matching_fields': 0,
+        'field_comparisons': []
+    }
+
+    other_fields = sorted((set(details1) | set(details2)) - {'Name', 'Date of Birth'})
+    for field in ['Name', 'Date of Birth'] + other_fields:
+        value1 = normalize_field(field, details1.get(field))
+        value2 = normalize_field(field, details2.get(field))
+        if not (value1 and value2):
+            continue
+        match = value1 == value2
+        comparison['total_fields'] += 1
+        if match:
+            comparison['matching_fields'] += 1
+        if field == 'Name':
+            comparison['name_match'] = match
+        elif field == 'Date of Birth':
+            comparison['dob_match'] = match
+        elif field in NUMBER_FIELDS and match:
+            comparison['card_match'] = True
+        comparison['field_comparisons'].append({
+            'field': field,
+            'value1': value1,
+            'value2': value2,
+            'match': match
+        })
+
+    # Determine overall match
+    if comparison['name_match'] and comparison['dob_match']:
+        comparison['overall_result'] = 'match'
+        comparison['result_text'] = '✅ Both ID cards belong to the same person!'
+        comparison['result_color'] = 'green'
+    elif comparison['name_match'] or comparison['dob_match']:
+        comparison['overall_result'] = 'partial'
+        comparison['result_text'] = '⚠️ Partial match: Some fields match, please review.'
+        comparison['result_color'] = 'orange'
+    else:
+        comparison['overall_result'] = 'no_match'
+        comparison['result_text'] = '❌ ID cards do NOT belong to the same person!'
+        comparison['result_color'] = 'red'
+
+    return comparison
@@ -1,199 +1,566 @@
+import os
 import re
-import pytesseract
-from PIL import Image
+import sys
+from metrics import count_lang, stage
+from ocr_cache import get_cache
+from ocr_engine import get_engine
+from ocr_config import OCR_PRESET, check_preset, field_config, ocr_config
+from card_layouts import CARD_LAYOUTS, HEADER_BOX, crop_region, is_card_shaped
+from preprocess import ORIENTATION_MODE, TARGET_DPI, correct_orientation, load_for_ocr, prepare_for_ocr
+from validators import valid_card_number, validate_details
+from word_layout import (find_label, group_lines, line_above, line_below, lines_text, normalize, value_confidence,
+                         words_after)
 
-def detect_id_card(text):
-    # Convert text to uppercase for better matching
-    text_upper = text.upper()
-    
-    # Check for Aadhaar card patterns
-    aadhaar_patterns = [
-        r"\b\d{4}\s?\d{4}\s?\d{4}\b",  # 12-digit number pattern
-        r"AADHAAR",
-        r"आधार",
-        r"UNIQUE IDENTIFICATION AUTHORITY OF INDIA",
-        r"UIDAI",
-        r"BHARAT SARKAR",
-        r"GOVERNMENT OF INDIA"
-    ]
-    
-    aadhaar_score = 0
-    for pattern in aadhaar_patterns:
-        if re.search(pattern, text_upper, re.IGNORECASE):
-            aadhaar_score += 1
-    
-    # Check for PAN card patterns
-    pan_patterns = [
-        r"[A-Z]{5}[0-9]{4}[A-Z]{1}",  # PAN number pattern
-        r"INCOME TAX DEPARTMENT",
-        r"PERMANENT ACCOUNT NUMBER",
-        r"PAN",
-        r"INCOME TAX",
-        r"TAX DEPARTMENT"
-    ]
-    
-    pan_score = 0
-    for pattern in pan_patterns:
-        if re.search(pattern, text_upper, re.IGNORECASE):
-            pan_score += 1
-    
-    # Check for Passport patterns
-    passport_patterns = [
-        r"[A-Z]{1}[0-9]{7}",  # Passport number pattern
-        r"PASSPORT",
-        r"REPUBLIC OF INDIA",
-        r"GOVERNMENT OF INDIA",
-        r"MINISTRY OF EXTERNAL AFFAIRS",
-        r"PASSPORT OFFICE",
-        r"PASSPORT AUTHORITY"
-    ]
-    
-    passport_score = 0
-    for pattern in passport_patterns:
-        if re.search(pattern, text_upper, re.IGNORECASE):
-            passport_score += 1
-    
-    # Check for Driving License patterns
-    dl_patterns = [
-        r"[A-Z]{2}\d{2}\s?\d{11}\s?\d{4}",  # DL number pattern
-        r"DRIVING LICENCE",
-        r"DRIVING LICENSE",
-        r"LEARNER'S LICENCE",
-        r"MOTOR VEHICLES ACT",
-        r"RTO",
-        r"TRANSPORT DEPARTMENT",
-        r"LICENCE AUTHORITY"
-    ]
-    
-    dl_score = 0
-    for pattern in dl_patterns:
-        if re.search(pattern, text_upper, re.IGNORECASE):
-            dl_score += 1
-    
-    # Check for Voter ID patterns
-    voter_patterns = [
-        r"[A-Z]{3}\d{7}",  # Voter ID number pattern
-        r"ELECTION COMMISSION OF INDIA",
-        r"VOTER ID",
-        r"ELECTORAL PHOTO IDENTITY CARD",
-        r"EPIC",
-        r"ELECTION COMMISSION"
+# OCR settings; part of the cache key (with the ocr_config preset) so
+# changing them never serves stale results
+OCR_LANG = 'eng+hin'
+OCR_FAST_LANG = 'eng'
+
+# 'auto' reads English first and only re-reads with Hindi when the card
+# can't be classified or its number isn't found; any other value is a
+# Tesseract language string used as is
+LANG_MODE = os.environ.get('OCR_LANG_MODE', 'auto')
+LANG_MODES = {'auto', OCR_FAST_LANG, OCR_LANG}
+
+# Quality ladder: every card is first read at this fraction of the target
+# DPI in English; only fields that fail validation are read again, at the
+# full DPI and then with contrast stretched (and Hindi in 'auto' mode). An
+# image that can't be classified at all only gets the rungs in a new language
+FAST_DPI_SCALE = 2 / 3
+
+# Bump when the shape of extract_id_info's result changes so cached results are not reused
+RESULT_VERSION = 12
+
+# Marker phrases for each ID type, matched against upper-cased OCR text.
+# A phrase may count towards several types (e.g. GOVERNMENT OF INDIA).
+ID_KEYWORDS = {
+    "Aadhaar Card": [
+        "AADHAAR",
+        "आधार",
+        "UNIQUE IDENTIFICATION AUTHORITY OF INDIA",
+        "UIDAI",
+        "BHARAT SARKAR",
+        "GOVERNMENT OF INDIA"
+    ],
+    "PAN Card": [
+        "INCOME TAX DEPARTMENT",
+        "PERMANENT ACCOUNT NUMBER",
+        "PAN",
+        "INCOME TAX",
+        "TAX DEPARTMENT"
+    ],
+    "Passport": [
+        "PASSPORT",
+        "REPUBLIC OF INDIA",
+        "GOVERNMENT OF INDIA",
+        "MINISTRY OF EXTERNAL AFFAIRS",
+        "PASSPORT OFFICE",
+        "PASSPORT AUTHORITY"
+    ],
+    "Driving License": [
+        "DRIVING LICENCE",
+        "DRIVING LICENSE",
+        "LEARNER'S LICENCE",
+        "MOTOR VEHICLES ACT",
+        "RTO",
+        "TRANSPORT DEPARTMENT",
+        "LICENCE AUTHORITY"
+    ],
+    "Voter ID": [
+        "ELECTION COMMISSION OF INDIA",
+        "VOTER ID",
+        "ELECTORAL PHOTO IDENTITY CARD",
+        "EPIC",
+        "ELECTION COMMISSION"
     ]
-    
-    voter_score = 0
-    for pattern in voter_patterns:
-        if re.search(pattern, text_upper, re.IGNORECASE):
-            voter_score += 1
-    
-    # Determine the ID type based on highest score
-    scores = {
-        "Aadhaar Card": aadhaar_score,
-        "PAN Card": pan_score,
-        "Passport": passport_score,
-        "Driving License": dl_score,
-        "Voter ID": voter_score
-    }
+}
+
+# Card number format for each ID type
+ID_NUMBER_PATTERNS = {
+    # 12-digit number; a lookahead so overlapping candidates are all tried, and
+    # [ ] rather than \s so a group never joins digits across a line break
+    "Aadhaar Card": re.compile(r"\b(?=(\d{4}[ ]?\d{4}[ ]?\d{4})\b)"),
+    "PAN Card": re.compile(r"[A-Z]{5}[0-9]{4}[A-Z]{1}"),
+    "Passport": re.compile(r"[A-Z]{1}[0-9]{7}"),
+    "Driving License": re.compile(r"[A-Z]{2}\d{2}[ ]?\d{11}[ ]?\d{4}"),
+    "Voter ID": re.compile(r"[A-Z]{3}\d{7}")
+}
+_DIGIT = re.compile(r"\d")
+# ID type of a card that couldn't be classified
+UNKNOWN_ID_TYPE = "Unknown ID Type"
+
+def _keyword_owners(keywords):
+    """Map each distinct marker phrase to the ID types it counts towards"""
+    owners = {}
+    for id_type, phrases in keywords.items():
+        for phrase in phrases:
+            owners.setdefault(phrase, []).append(id_type)
+    return tuple((phrase, tuple(id_types)) for phrase, id_types in owners.items())
+
+_KEYWORD_OWNERS = _keyword_owners(ID_KEYWORDS)
+
+def classify_id_card(text):
+    """Score OCR text against every ID type.
+
+    Upper-cases the text once, checks each distinct marker phrase once
+    (plain substring search, which runs in C and beats a regex alternation
+    here) and each card number format once. Returns (id_type, scores) where
+    scores maps each ID type to the number of its markers and number format
+    found, and id_type is the highest-scoring type (first listed wins a tie)
+    or "Unknown ID Type" when nothing matched.
+    """
+    with stage('classify'):
+        # Convert text to uppercase for better matching
+        text_upper = text.upper()
+        
+        scores = dict.fromkeys(ID_KEYWORDS, 0)
+        for phrase, owners in _KEYWORD_OWNERS:
+            if phrase in text_upper:
+                for id_type in owners:
+                    scores[id_type] += 1
+        
+        # Every card number format contains digits
+        if _DIGIT.search(text_upper):
+            for id_type, pattern in ID_NUMBER_PATTERNS.items():
+                if pattern.search(text_upper):
+                    scores[id_type] += 1
     
     # Find the type with highest score
     max_score = max(scores.values())
     if max_score > 0:
-        # Return the type with highest score
         for id_type, score in scores.items():
             if score == max_score:
-                return id_type
+                return id_type, scores
     
-    # If no clear match, try additional heuristics
-    if re.search(r"\b\d{4}\s?\d{4}\s?\d{4}\b", text):
-        return "Aadhaar Card"
-    elif re.search(r"[A-Z]{5}[0-9]{4}[A-Z]{1}", text):
-        return "PAN Card"
-    elif re.search(r"[A-Z]{1}[0-9]{7}", text):
-        return "Passport"
-    elif re.search(r"[A-Z]{2}\d{2}\s?\d{11}\s?\d{4}", text):
-        return "Driving License"
-    elif re.search(r"[A-Z]{3}\d{7}", text):
-        return "Voter ID"
-    
-    return "Unknown ID Type"
+    return UNKNOWN_ID_TYPE, scores
+
+def detect_id_card(text):
+    return classify_id_card(text)[0]
 
-def extract_id_info(image_path):
-    # Load image
-    img = Image.open(image_path)
+def is_pil_image(source):
+    # A PIL image can only exist once PIL has been imported, so this never imports it
+    image_module = sys.modules.get('PIL.Image')
+    return image_module is not None and isinstance(source, image_module.Image)
+
+def read_image_bytes(source):
+    """Return the raw bytes of a file path, bytes object or binary file object"""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if hasattr(source, 'read'):
+        return source.read()
+    with open(source, 'rb') as f:
+        return f.read()
+
+def extract_id_info(source, use_layout=True, target_dpi=None, lang_mode=None, preset=None):
+    # Accepts a path, bytes, binary file object or an in-memory PIL image
+    # (rendered PDF pages, card crops); identical inputs hash to the same cache entry.
+    # preset names the ocr_config Tesseract settings (default OCR_PRESET)
+    if is_pil_image(source):
+        data = source.tobytes()
+        image_key = {'mode': source.mode, 'size': list(source.size)}
+    else:
+        data = read_image_bytes(source)
+        image_key = {}
     
-    # Perform OCR
-    text = pytesseract.image_to_string(img, lang='eng+hin')
+    target_dpi = target_dpi or TARGET_DPI
+    lang_mode = lang_mode or LANG_MODE
+    preset = check_preset(preset or OCR_PRESET)
+    engine = get_engine()
+    cache = get_cache()
+    if cache is not None:
+        cache_key = cache.make_key(data, lang=lang_mode, config=preset, engine=engine.name, layout=use_layout,
+                                   target_dpi=target_dpi, orientation=ORIENTATION_MODE, version=RESULT_VERSION,
+                                   **image_key)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
     
-    # Detect ID type
-    id_type = detect_id_card(text)
+    # Decode at reduced scale, grayscale and resize to the target DPI
+    if image_key:
+        img, preprocessing = prepare_for_ocr(source, target_dpi)
+    else:
+        img, preprocessing = load_for_ocr(data, target_dpi)
+    # Sideways, upside-down and skewed scans are turned once, before any OCR
+    img, preprocessing['orientation'] = correct_orientation(img, engine.detect_orientation)
     
-    # Extract specific details based on ID type
-    details = {}
+    result = None
+    failing = []
+    passes = []
+    for rung in quality_ladder(lang_mode):
+        if failing == ["ID Type"] and any(attempt["lang"] == rung["lang"] for attempt in passes):
+            # Nothing card-like was read (a blank or non-ID page): only a new language can change that
+            continue
+        rung_img = scale_image(img, rung["scale"])
+        if rung["enhance"]:
+            rung_img = enhance_contrast(rung_img)
+        if result is not None and result["OCR Mode"] == "layout":
+            # The card is classified and its number validated: read only the failing regions
+            lang = reread_layout_fields(rung_img, engine, result, failing, rung["lang"], preset)
+            read = failing
+        else:
+            lang = rung["lang"]
+            new = ocr_card(rung_img, engine, lang, use_layout, preset)
+            result = new if result is None else merge_results(result, new)
+            read = "all"
+        failing = failing_fields(result)
+        passes.append({"dpi": round(target_dpi * rung["scale"]), "lang": lang,
+                       "enhanced": rung["enhance"], "fields": read, "failing": failing})
+        if not failing:
+            break
+    result["Validation"] = validation(result)
+    result["Quality Passes"] = passes
+    result["OCR Language"] = passes[-1]["lang"]
+    result["Language Passes"] = [attempt["lang"] for attempt in passes]
+    count_lang(result["OCR Language"])
+    result["Preprocessing"] = preprocessing
     
-    # Common date patterns in Indian ID cards
-    date_patterns = [
-        r'\b\d{2}[/-]\d{2}[/-]\d{4}\b',  # DD/MM/YYYY or DD-MM-YYYY
-        r'\b\d{2}\.\d{2}\.\d{4}\b',      # DD.MM.YYYY
-        r'\b\d{4}[/-]\d{2}[/-]\d{2}\b',  # YYYY/MM/DD or YYYY-MM-DD
-        r'\bDOB[:\s]+(\d{2}[/-]\d{2}[/-]\d{4})\b',  # DOB: DD/MM/YYYY
-        r'\bDate of Birth[:\s]+(\d{2}[/-]\d{2}[/-]\d{4})\b'  # Date of Birth: DD/MM/YYYY
-    ]
+    if cache is not None:
+        cache.put(cache_key, result)
+    return result
+
+def ocr_card(img, engine, lang, use_layout=True, preset=None):
+    """Run one OCR pass over a preprocessed image and extract its fields"""
+    # Cropped cards: read only the regions holding the fields we extract
+    if use_layout and is_card_shaped(img.size):
+        result = extract_with_layout(img, engine, lang, preset)
+        if result is not None:
+            return result
     
+    # One OCR pass gives the text and where every word sits
+    words = engine.image_to_data(img, lang=lang, config=ocr_config('page', preset=preset))
+    result = parse_id_words(words)
+    result["OCR Mode"] = "full"
+    return result
+
+def quality_ladder(lang_mode):
+    """The passes a card may get, cheapest first"""
+    # English alone is much faster than eng+hin and every field we extract is Latin script
+    langs = [OCR_FAST_LANG, OCR_FAST_LANG, OCR_LANG] if lang_mode == 'auto' else [lang_mode] * 3
+    return [
+        {"scale": FAST_DPI_SCALE, "lang": langs[0], "enhance": False},
+        {"scale": 1.0, "lang": langs[1], "enhance": False},
+        {"scale": 1.0, "lang": langs[2], "enhance": True},
+    ]
+
+def scale_image(img, scale):
+    if scale == 1.0:
+        return img
+    from PIL import Image
+    size = (max(1, round(img.size[0] * scale)), max(1, round(img.size[1] * scale)))
+    return img.resize(size, Image.Resampling.BILINEAR)
+
+def enhance_contrast(img):
+    """Stretch a grayscale image's contrast, for faded or low-contrast prints"""
+    from PIL import ImageOps
+    return ImageOps.autocontrast(img, cutoff=1)
+
+def validation(result):
+    """Pass or fail for each field of a result's ID type (validators.validate_details)"""
+    id_type = result["ID Type"]
+    if id_type not in CARD_NUMBER_FIELDS:
+        return {}
+    return validate_details(id_type, CARD_NUMBER_FIELDS[id_type], result["Details"])
+
+def failing_fields(result):
+    """Fields worth reading again; "ID Type" when the card couldn't be classified"""
+    if result["ID Type"] not in CARD_NUMBER_FIELDS:
+        return ["ID Type"]
+    return [field for field, valid in validation(result).items() if not valid]
+
+def merge_results(previous, new):
+    """Combine a re-read with an earlier result, keeping the fields that already validated"""
+    if new["ID Type"] != previous["ID Type"]:
+        # The two passes disagree on the card: keep a classified one, then the one with fewer
+        # failing fields, the re-read on a tie
+        if previous["ID Type"] not in CARD_NUMBER_FIELDS or new["ID Type"] not in CARD_NUMBER_FIELDS:
+            return previous if new["ID Type"] not in CARD_NUMBER_FIELDS else new
+        return previous if len(failing_fields(previous)) < len(failing_fields(new)) else new
+    passed = validation(previous)
+    merged = dict(new)
+    merged["Details"] = dict(previous["Details"])
+    merged["Field Confidence"] = dict(previous.get("Field Confidence", {}))
+    for field, value in new["Details"].items():
+        if not passed.get(field):
+            merged["Details"][field] = value
+            merged["Field Confidence"][field] = new.get("Field Confidence", {}).get(field)
+    return merged
+
+# Details key holding the card number for each ID type
+CARD_NUMBER_FIELDS = {
+    "Aadhaar Card": "Aadhaar Number",
+    "PAN Card": "PAN Number",
+    "Passport": "Passport Number",
+    "Driving License": "DL Number",
+    "Voter ID": "Voter ID Number"
+}
+
+# Common date patterns in Indian ID cards
+DATE_PATTERNS = [
+    r'\b\d{2}[/-]\d{2}[/-]\d{4}\b',  # DD/MM/YYYY or DD-MM-YYYY
+    r'\b\d{2}\.\d{2}\.\d{4}\b',      # DD.MM.YYYY
+    r'\b\d{4}[/-]\d{2}[/-]\d{2}\b',  # YYYY/MM/DD or YYYY-MM-DD
+    r'\bDOB[:\s]+(\d{2}[/-]\d{2}[/-]\d{4})\b',  # DOB: DD/MM/YYYY
+    r'\bDate of Birth[:\s]+(\d{2}[/-]\d{2}[/-]\d{4})\b'  # Date of Birth: DD/MM/YYYY
+]
+
+# Name patterns
+NAME_PATTERNS = [
+    r"(?:Name|Name of Applicant|Name of Holder)'[:\s]+([A-Za-z\s\.]+)(?:\n|$)",
+    r"([A-Za-z\s\.]+)(?:\n|$)(?=.*DOB|.*Date of Birth|.*Birth)",
+    r"(?:Name|Name of Applicant|Name of Holder)[:\s]*([A-Za-z\s\.]+)(?=\s*DOB|\s*Date|\s*Birth|\s*Father|\s*Mother)",
+    r"([A-Za-z\s\.]+)(?=\s*DOB|\s*Date|\s*Birth|\s*Father|\s*Mother|\s*Permanent|\s*PAN|\s*Passport|\s*DL|\s*EPIC)"
+]
+
+# Labels printed beside or above each field's value, most specific first
+FIELD_LABELS = {
+    "Name": ["NAME"],
+    "Date of Birth": ["DATE OF BIRTH", "DOB", "YEAR OF BIRTH", "BIRTH"],
+    "PAN Number": ["PERMANENT ACCOUNT NUMBER"],
+    "Passport Number": ["PASSPORT NO"],
+    "DL Number": ["DL NO", "LICENCE NO", "LICENSE NO"],
+    "Voter ID Number": ["EPIC NO", "EPIC"]
+}
+# Words before "Name" that make it someone else's name
+OTHER_NAME_WORDS = {"FATHER", "FATHERS", "MOTHER", "MOTHERS", "HUSBAND", "HUSBANDS", "GUARDIAN", "GUARDIANS"}
+
+def find_date_of_birth(text):
     # Try to find date of birth using various patterns
-    for pattern in date_patterns:
+    for pattern in DATE_PATTERNS:
         dob_match = re.search(pattern, text, re.IGNORECASE)
         if dob_match:
             # Extract the date part from the match
-            dob = dob_match.group(1) if len(dob_match.groups()) > 0 else dob_match.group(0)
-            details["Date of Birth"] = dob
-            break
-    
-    # Extract name patterns
-    name_patterns = [
-        r"(?:Name|Name of Applicant|Name of Holder)'[:\s]+([A-Za-z\s\.]+)(?:\n|$)",
-        r"([A-Za-z\s\.]+)(?:\n|$)(?=.*DOB|.*Date of Birth|.*Birth)",
-        r"(?:Name|Name of Applicant|Name of Holder)[:\s]*([A-Za-z\s\.]+)(?=\s*DOB|\s*Date|\s*Birth|\s*Father|\s*Mother)",
-        r"([A-Za-z\s\.]+)(?=\s*DOB|\s*Date|\s*Birth|\s*Father|\s*Mother|\s*Permanent|\s*PAN|\s*Passport|\s*DL|\s*EPIC)"
-    ]
-    
-    for pattern in name_patterns:
+            return dob_match.group(1) if len(dob_match.groups()) > 0 else dob_match.group(0)
+    return None
+
+def clean_name(name):
+    name = re.sub(r'\s+', ' ', name)  # Remove extra spaces
+    name = re.sub(r'[^A-Za-z\s\.]', '', name)  # Remove special characters except spaces and dots
+    name = name.strip()  # Remove leading/trailing spaces
+    # Only keep names with a reasonable length
+    return name if len(name) > 2 else None
+
+def find_name(text):
+    for pattern in NAME_PATTERNS:
         name_match = re.search(pattern, text, re.IGNORECASE)
         if name_match:
-            name = name_match.group(1).strip()
-            # Clean up the name
-            name = re.sub(r'\s+', ' ', name)  # Remove extra spaces
-            name = re.sub(r'[^A-Za-z\s\.]', '', name)  # Remove special characters except spaces and dots
-            name = name.strip()  # Remove leading/trailing spaces
-            if name and len(name) > 2:  # Only store if name is not empty and has reasonable length
-                details["Name"] = name
-                break
+            name = clean_name(name_match.group(1).strip())
+            if name:
+                return name
+    return None
+
+def find_card_number(id_type, text):
+    """The first number in the text with the format and checks (validators) of the ID type's card numbers"""
+    pattern = ID_NUMBER_PATTERNS.get(id_type)
+    if pattern is None:
+        return None
+    for number_match in pattern.finditer(text):
+        # Aadhaar and DL numbers are often printed in space-separated groups
+        number = (number_match.group(1) if pattern.groups else number_match.group()).replace(" ", "")
+        # A random 12-digit run is not an Aadhaar number unless its check digit agrees
+        if valid_card_number(id_type, number):
+            return number
+    return None
+
+def name_from_region(text):
+    """Pick the name out of the text of a name region, dropping field labels"""
+    best = None
+    for line in text.splitlines():
+        line = re.sub(r"^\s*(?:Name|Surname|Given Names?(?:\s*\(s\))?)[:\s]*", "", line, flags=re.IGNORECASE)
+        name = clean_name(line)
+        if name and (best is None or len(name) > len(best)):
+            best = name
+    return best
+
+def extract_with_layout(img, engine, lang=OCR_LANG, preset=None):
+    """OCR the header band and the field regions of a card-shaped image.
+
+    The header classifies the card, then only the Name, Date of Birth and
+    card number regions from its layout are read, each with the Tesseract
+    settings ocr_config's preset gives that field and with the confidence
+    of the words it was read from. Returns None when the
+    header doesn't identify a type with a layout, the field text disagrees
+    with it, or no card number is found, so the caller can fall back to a
+    full-card pass.
+    """
+    header_text = lines_text(group_lines(engine.image_to_data(crop_region(img, HEADER_BOX), lang=lang,
+                                                              config=ocr_config('header', preset=preset))))
+    id_type = detect_id_card(header_text)
+    layout = CARD_LAYOUTS.get(id_type)
+    if layout is None:
+        return None
+    
+    details = {}
+    confidence = {}
+    texts = [header_text]
+    for field in layout:
+        value, field_confidence, field_text = read_layout_field(img, engine, id_type, field, lang, preset)
+        texts.append(field_text)
+        if value:
+            details[field] = value
+            confidence[field] = field_confidence
     
-    if id_type == "Aadhaar Card":
-        aadhaar_no = re.search(r"\b\d{4}\s?\d{4}\s?\d{4}\b", text)
-        if aadhaar_no:
-            details["Aadhaar Number"] = aadhaar_no.group().replace(" ", "")
+    text = "\n".join(texts)
+    text_type, id_scores = classify_id_card(text)
+    if text_type != id_type or CARD_NUMBER_FIELDS[id_type] not in details:
+        return None
+    
+    return {
+        "ID Type": id_type,
+        "ID Scores": id_scores,
+        "Details": details,
+        "Field Confidence": confidence,
+        "Raw Text": text,
+        "OCR Mode": "layout"
+    }
+
+def field_lang(id_type, field, lang):
+    """Language a layout field region is read in on a pass in lang: English unless Hindi is printed there"""
+    return lang if CARD_LAYOUTS[id_type][field].get("hindi") else OCR_FAST_LANG
+
+def read_layout_field(img, engine, id_type, field, lang=OCR_LANG, preset=None):
+    """OCR one field region of a card's layout; returns (value or None, confidence, region text)"""
+    region = CARD_LAYOUTS[id_type][field]
+    region_lang = field_lang(id_type, field, lang)
+    lines = group_lines(engine.image_to_data(crop_region(img, region["box"]), lang=region_lang,
+                                             config=field_config(id_type, field, preset, region_lang)))
+    field_text = lines_text(lines)
+    with stage('fields'):
+        if field == "Name":
+            value = name_from_region(field_text)
+        elif field == "Date of Birth":
+            value = find_date_of_birth(field_text)
+        else:
+            value = find_card_number(id_type, field_text)
+    return value, value_confidence(lines, value) if value else None, field_text
+
+def reread_layout_fields(img, engine, result, fields, lang=OCR_LANG, preset=None):
+    """Read the given fields of a layout result again, in place; a value replaces the old one if it validates.
+
+    Returns the language the regions were read in: lang if any of them
+    has Hindi printed in it, else English.
+    """
+    id_type = result["ID Type"]
+    texts = [result["Raw Text"]]
+    used = OCR_FAST_LANG
+    for field in fields:
+        if field not in CARD_LAYOUTS[id_type]:
+            continue
+        if field_lang(id_type, field, lang) == lang:
+            used = lang
+        value, confidence, field_text = read_layout_field(img, engine, id_type, field, lang, preset)
+        texts.append(field_text)
+        if value:
+            candidate = {"ID Type": id_type, "Details": dict(result["Details"], **{field: value})}
+            if field not in result["Details"] or validation(candidate)[field]:
+                result["Details"][field] = value
+                result["Field Confidence"][field] = confidence
+    result["Raw Text"] = "\n".join(texts)
+    return used
+
+def labelled_value(lines, field, parse):
+    """Parse a field from the words right of its label, or else from the line below it"""
+    labels = FIELD_LABELS.get(field)
+    if not labels:
+        return None
+    line, index = find_label(lines, labels, OTHER_NAME_WORDS if field == "Name" else ())
+    if line is None:
+        return None
+    candidates = [words_after(line, index)]
+    below = line_below(lines, line)
+    if below is not None:
+        candidates.append(below['words'])
+    for words in candidates:
+        value = parse(' '.join(word['text'] for word in words)) if words else None
+        if value:
+            return value
+    return None
+
+def is_marker_line(line):
+    """True if a line holds one of the ID_KEYWORDS phrases as whole words"""
+    padded = f" {' '.join(normalize(word['text']) for word in line['words'])} "
+    return any(f" {phrase} " in padded for phrase, _ in _KEYWORD_OWNERS)
+
+def name_above_birth_date(lines):
+    """The name printed without a label on the line above the date of birth (Aadhaar, PAN)"""
+    line, _ = find_label(lines, FIELD_LABELS["Date of Birth"])
+    while line is not None:
+        line = line_above(lines, line)
+        if line is None or is_marker_line(line):
+            return None
+        name = clean_name(line['text'])
+        if name:
+            return name
+    return None
+
+def parse_id_words(words):
+    """Classify the words of one image_to_data pass and pull out the fields for its ID type.
+
+    Each field is read right of or below its printed label, and a name
+    without a label from the line above the date of birth; a field whose
+    label isn't found falls back to parse_id_text's patterns over the
+    whole text. "Field Confidence" holds Tesseract's mean confidence
+    (0-1) in the words each value was read from.
+    """
+    lines = group_lines(words)
+    text = lines_text(lines)
+    id_type, id_scores = classify_id_card(text)
     
-    elif id_type == "PAN Card":
-        pan_no = re.search(r"[A-Z]{5}[0-9]{4}[A-Z]{1}", text)
-        if pan_no:
-            details["PAN Number"] = pan_no.group()
+    details = {}
+    with stage('fields'):
+        dob = labelled_value(lines, "Date of Birth", find_date_of_birth) or find_date_of_birth(text)
+        if dob:
+            details["Date of Birth"] = dob
+        
+        name = labelled_value(lines, "Name", clean_name) or name_above_birth_date(lines) or find_name(text)
+        if name:
+            details["Name"] = name
+        
+        if id_type in CARD_NUMBER_FIELDS:
+            number_field = CARD_NUMBER_FIELDS[id_type]
+            card_number = (labelled_value(lines, number_field, lambda value: find_card_number(id_type, value))
+                           or find_card_number(id_type, text))
+            if card_number:
+                details[number_field] = card_number
+        
+        confidence = {field: value_confidence(lines, value) for field, value in details.items()}
     
-    elif id_type == "Passport":
-        passport_no = re.search(r"[A-Z]{1}[0-9]{7}", text)
-        if passport_no:
-            details["Passport Number"] = passport_no.group()
+    return {
+        "ID Type": id_type,
+        "ID Scores": id_scores,
+        "Details": details,
+        "Field Confidence": confidence,
+        "Raw Text": text
+    }
+
+def parse_id_text(text):
+    """Classify OCR text and pull out the fields for its ID type.
+
+    The pipeline reads word positions (parse_id_words); this is kept, and
+    exported by idcore, for text that comes without them, such as another
+    OCR service's output or stored raw text.
+    """
+    # Detect ID type
+    id_type, id_scores = classify_id_card(text)
     
-    elif id_type == "Driving License":
-        dl_no = re.search(r"[A-Z]{2}\d{2}\s?\d{11}\s?\d{4}", text)
-        if dl_no:
-            details["DL Number"] = dl_no.group().replace(" ", "")
+    # Extract specific details based on ID type
+    details = {}
     
-    elif id_type == "Voter ID":
-        voter_id = re.search(r"[A-Z]{3}\d{7}", text)
-        if voter_id:
-            details["Voter ID Number"] = voter_id.group()
+    with stage('fields'):
+        dob = find_date_of_birth(text)
+        if dob:
+            details["Date of Birth"] = dob
+        
+        name = find_name(text)
+        if name:
+            details["Name"] = name
+        
+        card_number = find_card_number(id_type, text)
+        if card_number:
+            details[CARD_NUMBER_FIELDS[id_type]] = card_number
     
     return {
         "ID Type": id_type,
+        "ID Scores": id_scores,
         "Details": details,
         "Raw Text": text
     }
@@ -0,0 +1,99 @@
+import threading
+import time
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+class JobQueue:
+    """Tracks asynchronous OCR jobs running on a shared executor.
+
+    Jobs are started with ``submit_task(fn, *args)``, which returns a
+    future (the app submits to its OCR process pool), so HTTP request
+    concurrency is decoupled from OCR concurrency. At most ``max_pending``
+    jobs may be queued or running at once; finished jobs are kept for
+    ``ttl`` seconds for polling. A job lost to a crashed pool worker
+    (BrokenProcessPool) is run once more before it is reported as failed.
+    """
+
+    def __init__(self, submit_task, max_pending=100, ttl=3600):
+        self.submit_task = submit_task
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        """Queue fn(*args) and return the new job's id"""
+        with self._lock:
+            self._expire()
+            pending = sum(1 for job in self._jobs.values() if job['finished_at'] is None)
+            if pending >= self.max_pending:
+                raise QueueFullError(f'Too many pending jobs (max {self.max_pending})')
+            job_id = uuid.uuid4().hex
+            job = {'created_at': time.time(), 'finished_at': None, 'retried': False}
+            job['future'] = self.submit_task(fn, *args)
+            self._jobs[job_id] = job
+        self._watch(job, fn, args)
+        return job_id
+
+    def _watch(self, job, fn, args):
+        def done(future):
+            lost = future.cancelled() or isinstance(future.exception(), BrokenProcessPool)
+            if lost and not job['retried']:
+                # A worker crashed (segfault, OOM kill) and took the pool down, or the broken pool was shut down
+                job['retried'] = True
+                try:
+                    job['future'] = self.submit_task(fn, *args)
+                except Exception:
+                    pass
+                else:
+                    self._watch(job, fn, args)
+                    return
+            job['finished_at'] = time.time()
+
+        job['future'].add_done_callback(done)
+
+    def get(self, job_id):
+        """Return the job's status dict, or None for an unknown or expired id"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+
+        # A job is only finished once any retry has been decided on, and its future is final by then
+        finished_at = job['finished_at']
+        future = job['future']
+        status = {'job_id': job_id, 'created_at': job['created_at'], 'finished_at': finished_at}
+        if finished_at is not None:
+            error = 'Cancelled' if future.cancelled() else future.exception()
+            if error is None:
+                status['status'] = 'done'
+                status['result'] = future.result()
+            else:
+                status['status'] = 'failed'
+                status['error'] = str(error)
+        elif future.running() or future.done():
+            status['status'] = 'running'
+        else:
+            status['status'] = 'queued'
+        return status
+
+    def stats(self):
+        with self._lock:
+            finished = [job['finished_at'] is not None for job in self._jobs.values()]
+        return {
+            'pending': finished.count(False),
+            'finished': finished.count(True),
+            'max_pending': self.max_pending
+        }
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['finished_at'] is not None and job['finished_at'] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
@@ -0,0 +1,212 @@
+import contextvars
+import multiprocessing
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Pipeline stages timed on the hot path
+STAGES = ['request', 'decode', 'preprocess', 'orient', 'ocr', 'classify', 'fields', 'serialize']
+# Upper bounds (seconds) of the stage duration histogram buckets
+STAGE_BUCKETS = [0.0001, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+# Upper bounds (megapixels) of the decoded image size histogram buckets
+IMAGE_BUCKETS = [0.1, 0.5, 1, 2, 4, 8, 12, 16, 24, 50]
+# Label values of the counters; anything else is counted as 'other'
+OCR_LANGS = ['eng', 'eng+hin', 'other']
+ERROR_KINDS = ['bad_request', 'processing', 'queue_full', 'server_error', 'card_store']
+
+# Stage durations of the request being traced, shared with the worker
+# threads it hands cards and pages to
+_trace = contextvars.ContextVar('ocr_trace', default=None)
+_NOOP = nullcontext()
+
+
+class Metrics:
+    """Process-shared histograms and counters for the OCR pipeline.
+
+    Everything lives in one shared-memory array created before the worker
+    pool forks, so stages timed inside pool workers add to the same totals
+    the Flask process renders at ``/metrics``.
+    """
+
+    def __init__(self):
+        self._offsets = {}
+        size = 0
+        for stage in STAGES:
+            self._offsets[('stage', stage)] = size
+            size += len(STAGE_BUCKETS) + 3  # buckets, +Inf, sum, count
+        self._offsets[('image', '')] = size
+        size += len(IMAGE_BUCKETS) + 3
+        for lang in OCR_LANGS:
+            self._offsets[('lang', lang)] = size
+            size += 1
+        for kind in ERROR_KINDS:
+            self._offsets[('error', kind)] = size
+            size += 1
+        self._values = multiprocessing.Array('d', size)
+
+    def observe_stage(self, stage, seconds):
+        self._observe(self._offsets[('stage', stage)], STAGE_BUCKETS, seconds)
+
+    def observe_image(self, megapixels):
+        self._observe(self._offsets[('image', '')], IMAGE_BUCKETS, megapixels)
+
+    def count_lang(self, lang):
+        self._increment(('lang', lang if lang in OCR_LANGS else 'other'))
+
+    def count_error(self, kind):
+        self._increment(('error', kind))
+
+    def _observe(self, offset, buckets, value):
+        bucket = len(buckets)
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                bucket = index
+                break
+        with self._values.get_lock():
+            self._values[offset + bucket] += 1
+            self._values[offset + len(buckets) + 1] += value
+            self._values[offset + len(buckets) + 2] += 1
+
+    def _increment(self, key):
+        with self._values.get_lock():
+            self._values[self._offsets[key]] += 1
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+        with self._values.get_lock():
+            values = self._values[:]
+        lines = ['# HELP ocr_stage_seconds Time spent in each processing stage.',
+                 '# TYPE ocr_stage_seconds histogram']
+        for stage in STAGES:
+            lines += _histogram_lines('ocr_stage_seconds', f'stage="{stage}",', STAGE_BUCKETS,
+                                      values, self._offsets[('stage', stage)])
+        lines += ['# HELP ocr_image_megapixels Size of decoded input images.',
+                  '# TYPE ocr_image_megapixels histogram']
+        lines += _histogram_lines('ocr_image_megapixels', '', IMAGE_BUCKETS, values, self._offsets[('image', '')])
+        lines += ['# HELP ocr_language_total Cards read, by the OCR language of the final pass.',
+                  '# TYPE ocr_language_total counter']
+        lines += [f'ocr_language_total{{lang="{lang}"}} {values[self._offsets[("lang", lang)]]:g}'
+                  for lang in OCR_LANGS]
+        lines += ['# HELP ocr_errors_total Failed requests and cards, by kind.',
+                  '# TYPE ocr_errors_total counter']
+        lines += [f'ocr_errors_total{{kind="{kind}"}} {values[self._offsets[("error", kind)]]:g}'
+                  for kind in ERROR_KINDS]
+        return '\n'.join(lines) + '\n'
+
+
+def _histogram_lines(name, labels, buckets, values, offset):
+    lines = []
+    cumulative = 0
+    for index, bound in enumerate(buckets + ['+Inf']):
+        cumulative += values[offset + index]
+        lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {cumulative:g}')
+    labels = labels.rstrip(',')
+    labels = f'{{{labels}}}' if labels else ''
+    lines.append(f'{name}_sum{labels} {values[offset + len(buckets) + 1]:.6f}')
+    lines.append(f'{name}_count{labels} {values[offset + len(buckets) + 2]:g}')
+    return lines
+
+
+_metrics = None
+_configured = False
+
+
+def get_metrics():
+    """Return the process-wide metrics, or None when ``OCR_METRICS=0``"""
+    global _metrics, _configured
+    if not _configured:
+        if os.environ.get('OCR_METRICS', '1') != '0':
+            _metrics = Metrics()
+        _configured = True
+    return _metrics
+
+
+class _Stage:
+    __slots__ = ('name', 'metrics', 'timings', 'start')
+
+    def __init__(self, name, metrics, timings):
+        self.name = name
+        self.metrics = metrics
+        self.timings = timings
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if self.metrics is not None:
+            self.metrics.observe_stage(self.name, elapsed)
+        if self.timings is not None:
+            self.timings.add(self.name, elapsed)
+        return False
+
+
+def stage(name):
+    """Context manager timing one pipeline stage.
+
+    A shared no-op when metrics are disabled and no trace is active, so
+    instrumented code costs a function call and two lookups.
+    """
+    metrics = get_metrics()
+    timings = _trace.get()
+    if metrics is None and timings is None:
+        return _NOOP
+    return _Stage(name, metrics, timings)
+
+
+def observe_image(size):
+    """Record the (width, height) of a decoded input image"""
+    metrics = get_metrics()
+    if metrics is not None:
+        metrics.observe_image(size[0] * size[1] / 1e6)
+
+
+def count_lang(lang):
+    metrics = get_metrics()
+    if metrics is not None:
+        metrics.count_lang(lang)
+
+
+def count_error(kind):
+    metrics = get_metrics()
+    if metrics is not None:
+        metrics.count_error(kind)
+
+
+class Timings:
+    """Stage durations collected for one traced request"""
+
+    def __init__(self):
+        self._seconds = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self._seconds[name] = self._seconds.get(name, 0.0) + seconds
+
+    def as_dict(self):
+        """Milliseconds per stage, summed over every call in the request"""
+        with self._lock:
+            return {name: round(seconds * 1000, 3) for name, seconds in self._seconds.items()}
+
+
+@contextmanager
+def trace():
+    """Collect the stage durations of the code run inside the block.
+
+    Yields a Timings; stages run in threads started through ``bind`` count
+    towards it too. Works whether or not metrics are enabled.
+    """
+    timings = Timings()
+    token = _trace.set(timings)
+    try:
+        yield timings
+    finally:
+        _trace.reset(token)
+
+
+def bind(fn):
+    """Wrap fn to run in the caller's context, for handing work to a thread pool"""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
@@ -1,21 +1,14 @@
 import cv2
 from PIL import Image, ImageTk
 import os
-from identification import extract_id_info, detect_id_card
+from idcore import compare_id_info, extract_cards, extract_id_info, extract_pdf_info
 import re
-from test import IDVerificationApp
 import sys
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import threading
 import time
 import traceback
-# Add for PDF support
-try:
-    from pdf2image import convert_from_path
-except ImportError:
-    convert_from_path = None
-    # User will be notified in the GUI if pdf2image is missing
 
 class SimpleIDCardGUI:
     def __init__(self, root):
@@ -27,8 +20,6 @@ class SimpleIDCardGUI:
         self.result = None
         self.compare_var = tk.BooleanVar()
         self.create_widgets()
-        self.id_verifier = IDVerificationApp(tk.Tk())  # Hidden root for comparison logic
-        self.id_verifier.root.withdraw()
 
     def create_widgets(self):
         # Title
@@ -145,59 +136,29 @@ class SimpleIDCardGUI:
         info2 = None
         used_split = False
         num_cards_detected = 0
-        temp_pdf_images = []
         try:
-            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
             if is_pdf:
-                if convert_from_path is None:
-                    raise ImportError("pdf2image is not installed. Please install it with 'pip install pdf2image' and ensure poppler is available.")
+                # Pages are rendered one at a time and each card on a page is warped upright and read on its own
                 try:
-                    pages = convert_from_path(self.uploaded_file, poppler_path=r"ACTUAL_PATH_TO_BIN")
-                    print(len(pages))
+                    infos.extend(extract_pdf_info(self.uploaded_file))
                 except Exception as e:
                     traceback.print_exc()
                     error_label = tk.Label(self.results_frame, text=f"Error reading PDF: {str(e)}\nCheck if Poppler is installed and in PATH.", font=("Arial", 12), fg="red")
                     error_label.pack(anchor=tk.W, pady=(20, 10))
                     self.results_widgets.append(error_label)
                     return
-                if not pages:
+                if not infos:
                     error_label = tk.Label(self.results_frame, text="No pages found in PDF.", font=("Arial", 12), fg="red")
                     error_label.pack(anchor=tk.W, pady=(20, 10))
                     self.results_widgets.append(error_label)
                     return
-                for page_idx, pil_img in enumerate(pages):
-                    temp_img_path = f"_temp_pdf_page_{page_idx}.jpg"
-                    pil_img.save(temp_img_path, 'JPEG')
-                    temp_pdf_images.append(temp_img_path)
-                    img = cv2.imread(temp_img_path)
-                    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5)
-                    if len(faces) >= 1:
-                        for idx, (x, y, w, h) in enumerate(faces):
-                            card_img = img[y:y+h, x:x+w]
-                            temp_card_path = f"_temp_pdf_page_{page_idx}_card_{idx}.jpg"
-                            cv2.imwrite(temp_card_path, card_img)
-                            info = extract_id_info(temp_card_path)
-                            infos.append(info)
-                            os.remove(temp_card_path)
-                    else:
-                        info = extract_id_info(temp_img_path)
-                        infos.append(info)
                 num_cards_detected = len(infos)
             elif is_image and not self.second_file and self.compare_var.get():
                 img = cv2.imread(self.uploaded_file)
-                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5)
-                num_cards_detected = len(faces)
-                if len(faces) >= 2:
-                    infos = []
-                    for idx, (x, y, w, h) in enumerate(faces):
-                        card_img = img[y:y+h, x:x+w]
-                        temp_path = f"_temp_card_{idx}.jpg"
-                        cv2.imwrite(temp_path, card_img)
-                        info = extract_id_info(temp_path)
-                        infos.append(info)
-                        os.remove(temp_path)
+                cards = extract_cards(img)
+                num_cards_detected = len(cards)
+                if len(cards) >= 2:
+                    infos = cards
                     for idx, info in enumerate(infos):
                         id_type_label = tk.Label(self.results_frame, text=f"Detected ID Type (Card {idx+1}): {info['ID Type']}", 
                                                font=("Arial", 14, "bold"), fg="blue")
@@ -216,10 +177,6 @@ class SimpleIDCardGUI:
         except Exception as e:
             infos.append({'ID Type': 'Unknown', 'Details': {'Error': str(e)}, 'Raw Text': ''})
             num_cards_detected = 0
-        finally:
-            for temp_img_path in temp_pdf_images:
-                if os.path.exists(temp_img_path):
-                    os.remove(temp_img_path)
 
         num_cards_label = ttk.Label(self.results_frame, text=f"Number of ID cards detected: {len(infos)}", font=("Arial", 12, "bold"))
         num_cards_label.pack(anchor=tk.W, pady=(0, 10))
@@ -261,7 +218,7 @@ class SimpleIDCardGUI:
             id_type_label2.pack(anchor=tk.W, pady=(10, 0))
             self.results_widgets.append(id_type_label2)
             try:
-                comparison = self.id_verifier.compare_info(info1, info2)
+                comparison = compare_id_info(info1, info2)
                 name_match = comparison.get('name_match', False)
                 dob_match = comparison.get('dob_match', False)
                 details1 = info1.get('Details', {})
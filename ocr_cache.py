@@ -0,0 +1,223 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import warnings
+from collections import OrderedDict
+
+# Counter slots in the shared stats array
+_COUNTERS = ['memory_hits', 'disk_hits', 'misses', 'memory_evictions', 'disk_evictions', 'writes']
+
+
+class OCRCache:
+    """Content-addressed cache for OCR extraction results.
+
+    Two tiers: an in-process LRU of decoded results, and a size-bounded
+    directory of JSON files shared by every process pointed at the same
+    ``disk_dir``. Keys are a SHA-256 of the image bytes plus the OCR
+    settings, so the same scan uploaded twice never reaches Tesseract twice.
+
+    Counters live in shared memory, so worker processes forked after the
+    cache is created (e.g. the ``/upload/batch`` pool) report into the
+    same totals as the Flask process.
+
+    Entries are served as real extractions, so the disk tier is only used
+    in a directory private to the current user (see private_directory).
+    """
+
+    def __init__(self, max_entries=256, disk_dir=None, disk_max_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = multiprocessing.Array('q', len(_COUNTERS))
+        self._disk_bytes = None
+        if disk_dir and not private_directory(disk_dir):
+            warnings.warn(f"OCR cache directory {disk_dir} is not private to this user; the disk cache is disabled")
+            self.disk_dir = None
+
+    @staticmethod
+    def make_key(data, **settings):
+        """Hash image bytes together with the settings that affect the result"""
+        digest = hashlib.sha256(data)
+        digest.update(json.dumps(settings, sort_keys=True, default=str).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._count('memory_hits')
+                return json.loads(self._memory[key])
+
+        value = self._disk_get(key)
+        if value is None:
+            self._count('misses')
+            return None
+        self._count('disk_hits')
+        self._memory_put(key, json.dumps(value))
+        return value
+
+    def put(self, key, value):
+        encoded = json.dumps(value)
+        self._memory_put(key, encoded)
+        self._disk_put(key, encoded)
+        self._count('writes')
+
+    def stats(self):
+        """Return hit/miss/eviction counters and current tier sizes"""
+        with self._counters.get_lock():
+            stats = dict(zip(_COUNTERS, self._counters[:]))
+        stats['hits'] = stats['memory_hits'] + stats['disk_hits']
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        with self._lock:
+            stats['memory_entries'] = len(self._memory)
+        stats['memory_max_entries'] = self.max_entries
+        if self.disk_dir:
+            entries, size = self._disk_usage()
+            stats['disk_entries'] = len(entries)
+            stats['disk_bytes'] = size
+            stats['disk_max_bytes'] = self.disk_max_bytes
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.disk_dir:
+            for path, _, _ in self._disk_usage()[0]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._disk_bytes = 0
+
+    def _count(self, name, amount=1):
+        with self._counters.get_lock():
+            self._counters[_COUNTERS.index(name)] += amount
+
+    def _memory_put(self, key, encoded):
+        # Results are stored encoded so callers can't mutate cached entries
+        with self._lock:
+            self._memory[key] = encoded
+            self._memory.move_to_end(key)
+            evicted = 0
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self._count('memory_evictions', evicted)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key + '.json')
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            # Touch so eviction treats the entry as recently used
+            os.utime(path)
+            return value
+        except (OSError, ValueError):
+            return None
+
+    def _disk_put(self, key, encoded):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file and rename so other workers never read a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(encoded)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        if self._disk_bytes is None:
+            self._disk_bytes = self._disk_usage()[1]
+        else:
+            self._disk_bytes += len(encoded)
+        if self._disk_bytes > self.disk_max_bytes:
+            self._disk_evict()
+
+    def _disk_usage(self):
+        """Return ([(path, size, mtime), ...], total_size) for the disk tier"""
+        entries = []
+        total = 0
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, st.st_size, st.st_mtime))
+                total += st.st_size
+        return entries, total
+
+    def _disk_evict(self):
+        # Other workers write to the same directory, so rescan rather than
+        # trusting this process's running total, then trim to 90% of the bound
+        entries, total = self._disk_usage()
+        target = int(self.disk_max_bytes * 0.9)
+        evicted = 0
+        for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        self._disk_bytes = total
+        if evicted:
+            self._count('disk_evictions', evicted)
+
+
+def private_directory(path):
+    """Create path for the current user only (0700); True if it is private to them.
+
+    A directory that already exists but belongs to someone else, or that
+    other users can read or write, is not private: its entries could have
+    been planted or read by them.
+    """
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        st = os.stat(path)
+    except OSError:
+        return False
+    if not hasattr(os, 'getuid'):
+        # Windows: no owner or mode bits to check
+        return True
+    return st.st_uid == os.getuid() and not st.st_mode & 0o077
+
+
+_cache = None
+
+
+def get_cache():
+    """Return the process-wide OCR cache, configured from the environment.
+
+    ``OCR_CACHE=0`` disables caching, ``OCR_CACHE_ENTRIES`` sizes the memory
+    tier. Cached results hold names, card numbers and dates of birth, so
+    the disk tier is off unless ``OCR_CACHE_DIR`` names its directory;
+    ``OCR_CACHE_DISK_MB`` bounds it.
+    """
+    global _cache
+    if _cache is None and os.environ.get('OCR_CACHE', '1') != '0':
+        _cache = OCRCache(
+            max_entries=int(os.environ.get('OCR_CACHE_ENTRIES', 256)),
+            disk_dir=os.environ.get('OCR_CACHE_DIR') or None,
+            disk_max_bytes=int(os.environ.get('OCR_CACHE_DISK_MB', 256)) * 1024 * 1024,
+        )
+    return _cache
@@ -0,0 +1,115 @@
+"""Tesseract settings per ID type and field.
+
+A preset maps each kind of read (the header band, a whole page, and the
+name, date of birth and card number regions of a card layout) to a
+Tesseract config string, optionally per ID type. Number and date regions
+hold a single line from a known alphabet, so restricting the page
+segmentation mode and the characters Tesseract may output makes them
+both faster and far less error-prone than reading them as free text.
+"""
+import os
+import re
+
+DIGITS = '0123456789'
+UPPER = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+LETTERS = UPPER + UPPER.lower()
+
+# Page segmentation modes
+PSM_AUTO = 3
+PSM_BLOCK = 6
+PSM_LINE = 7
+# LSTM recognizer only
+OEM_LSTM = 1
+
+
+def tesseract_config(psm=None, oem=None, whitelist=None, dictionary=True):
+    """Build a Tesseract CLI config string (also understood by ocr_engine.parse_config)"""
+    parts = []
+    if psm is not None:
+        parts.append(f'--psm {psm}')
+    if oem is not None:
+        parts.append(f'--oem {oem}')
+    if whitelist:
+        parts.append(f'-c tessedit_char_whitelist={whitelist}')
+    if not dictionary:
+        # Word lists "correct" card numbers and dates into words
+        parts.append('-c load_system_dawg=0 -c load_freq_dawg=0')
+    return ' '.join(parts)
+
+
+def field_kind(field):
+    """'name', 'date' or 'number' for a layout field name"""
+    if field == 'Name':
+        return 'name'
+    if field == 'Date of Birth':
+        return 'date'
+    return 'number'
+
+
+# Preset name -> kind -> config, or kind -> {ID type: config} with '*' as
+# the default for types not listed
+PRESETS = {
+    # Tesseract's defaults for every read: automatic segmentation, any character
+    'generic': {
+        'header': '',
+        'page': '',
+        'name': '',
+        'date': '',
+        'number': '',
+    },
+    # Segmentation mode per region only
+    'segmented': {
+        'header': '',
+        'page': '',
+        'name': tesseract_config(psm=PSM_BLOCK),
+        'date': tesseract_config(psm=PSM_BLOCK),
+        'number': {
+            # The PAN number region also holds its label line
+            'PAN Card': tesseract_config(psm=PSM_BLOCK),
+            '*': tesseract_config(psm=PSM_LINE),
+        },
+    },
+    # Segmentation mode, LSTM only and the characters each field can contain
+    'restricted': {
+        'header': tesseract_config(oem=OEM_LSTM),
+        'page': tesseract_config(oem=OEM_LSTM),
+        'name': tesseract_config(psm=PSM_BLOCK, oem=OEM_LSTM, whitelist=LETTERS + '.'),
+        'date': tesseract_config(psm=PSM_BLOCK, oem=OEM_LSTM, whitelist=DIGITS + '/-.', dictionary=False),
+        'number': {
+            'Aadhaar Card': tesseract_config(psm=PSM_LINE, oem=OEM_LSTM, whitelist=DIGITS, dictionary=False),
+            'PAN Card': tesseract_config(psm=PSM_BLOCK, oem=OEM_LSTM, whitelist=UPPER + DIGITS, dictionary=False),
+            'Driving License': tesseract_config(psm=PSM_LINE, oem=OEM_LSTM, whitelist=UPPER + DIGITS + '-',
+                                                dictionary=False),
+            '*': tesseract_config(psm=PSM_LINE, oem=OEM_LSTM, whitelist=UPPER + DIGITS, dictionary=False),
+        },
+    },
+}
+
+# Preset used when none is given; part of the OCR cache key
+OCR_PRESET = os.environ.get('OCR_PRESET', 'restricted')
+
+
+def check_preset(preset):
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown OCR preset '{preset}' (use one of: {', '.join(sorted(PRESETS))})")
+    return preset
+
+
+def ocr_config(kind, id_type=None, preset=None):
+    """Tesseract config string for one kind of read ('header', 'page', 'name', 'date', 'number')"""
+    setting = PRESETS[check_preset(preset or OCR_PRESET)][kind]
+    if isinstance(setting, dict):
+        return setting.get(id_type, setting['*'])
+    return setting
+
+
+def field_config(id_type, field, preset=None, lang=None):
+    """Tesseract config string for a field region of an ID type's layout, read in lang.
+
+    Whitelists only hold Latin characters, so they are left out when Hindi
+    is read too: they would force its glyphs into Latin letters.
+    """
+    config = ocr_config(field_kind(field), id_type, preset)
+    if lang and 'hin' in lang.split('+'):
+        config = re.sub(r'\s*-c tessedit_char_whitelist=\S+', '', config).strip()
+    return config
@@ -0,0 +1,208 @@
+import importlib.util
+import os
+import shlex
+import threading
+from contextlib import contextmanager
+
+from metrics import stage
+
+
+def tesserocr_available():
+    """True if tesserocr is installed, without paying for importing it"""
+    return importlib.util.find_spec('tesserocr') is not None
+
+
+def parse_config(config):
+    """Split a Tesseract CLI config string into (psm, oem, variables)"""
+    psm = None
+    oem = None
+    variables = {}
+    args = shlex.split(config or '')
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg in ('--psm', '--oem') and i + 1 < len(args):
+            if arg == '--psm':
+                psm = int(args[i + 1])
+            else:
+                oem = int(args[i + 1])
+            i += 2
+            continue
+        if arg == '-c' and i + 1 < len(args):
+            key, _, value = args[i + 1].partition('=')
+            variables[key] = value
+            i += 2
+            continue
+        i += 1
+    return psm, oem, variables
+
+
+def parse_tsv(tsv):
+    """Words of Tesseract's TSV output (image_to_data).
+
+    Each word is a dict with its ``text``, ``conf`` (0-100), ``left``,
+    ``top``, ``width``, ``height`` and ``line``, the (block, paragraph,
+    line) it belongs to. Rows for blocks, paragraphs, lines and blank
+    words are dropped.
+    """
+    words = []
+    for row in tsv.splitlines():
+        columns = row.split('\t')
+        # Level 5 rows are words; this also skips pytesseract's header row
+        if len(columns) < 12 or columns[0] != '5':
+            continue
+        text = columns[11].strip()
+        if not text:
+            continue
+        words.append({
+            'text': text,
+            'conf': float(columns[10]),
+            'left': int(columns[6]),
+            'top': int(columns[7]),
+            'width': int(columns[8]),
+            'height': int(columns[9]),
+            'line': (int(columns[2]), int(columns[3]), int(columns[4]))
+        })
+    return words
+
+
+# Variables Tesseract only reads while loading a language; setting them on a
+# loaded API does nothing
+INIT_ONLY_VARIABLES = {
+    'load_system_dawg', 'load_freq_dawg', 'load_punc_dawg', 'load_number_dawg', 'load_unambig_dawg',
+    'load_bigram_dawg', 'user_words_file', 'user_patterns_file',
+}
+
+# Orientation and script detection only, giving up on images with almost no text
+OSD_CONFIG = '--psm 0 -c min_characters_to_try=10'
+
+
+class PytesseractEngine:
+    """Runs the ``tesseract`` binary once per call through pytesseract"""
+
+    name = 'pytesseract'
+
+    def __init__(self):
+        # Imported here rather than at module level: it costs ~0.1 s and
+        # processes that never OCR shouldn't pay it
+        import pytesseract
+        self._pytesseract = pytesseract
+
+    def image_to_data(self, img, lang, config=''):
+        """Words with their boxes, lines and confidences (see parse_tsv)"""
+        with stage('ocr'):
+            tsv = self._pytesseract.image_to_data(img, lang=lang, config=config)
+        return parse_tsv(tsv)
+
+    def detect_orientation(self, img):
+        """(clockwise degrees that turn the text upright, confidence), or None when Tesseract can't tell"""
+        try:
+            osd = self._pytesseract.image_to_osd(img, config=OSD_CONFIG, output_type=self._pytesseract.Output.DICT)
+        except self._pytesseract.TesseractError:
+            # Too little text, or osd.traineddata isn't installed
+            return None
+        return osd['rotate'], osd['orientation_conf']
+
+
+class TesserocrEngine:
+    """Keeps Tesseract loaded in-process through the C API (tesserocr).
+
+    Loaded ``PyTessBaseAPI`` instances are shared by every thread of the
+    process: one is borrowed for each call and returned afterwards, so the
+    traineddata of a (lang, oem) pair is loaded once per concurrent call
+    rather than once per thread, and survives the short-lived threads of
+    page and card executors and the dev server. The page segmentation mode
+    and variables such as character whitelists are set for each call and
+    put back when it ends; init-only variables (INIT_ONLY_VARIABLES, e.g.
+    turning the dictionaries off) are passed when the API is built and are
+    part of its key.
+    """
+
+    name = 'tesserocr'
+
+    def __init__(self, tessdata_path=None):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self.tessdata_path = tessdata_path
+        # (lang, oem, init-only variables) -> idle APIs
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _new_api(self, lang, oem, init_variables):
+        kwargs = {'lang': lang, 'variables': init_variables}
+        if self.tessdata_path:
+            kwargs['path'] = self.tessdata_path
+        if oem is not None:
+            kwargs['oem'] = oem
+        return self._tesserocr.PyTessBaseAPI(**kwargs)
+
+    @contextmanager
+    def _api(self, lang, psm, oem, variables):
+        """Borrow an idle API for (lang, oem, init-only variables), set up with the call's psm and variables"""
+        init_variables = {name: value for name, value in variables.items() if name in INIT_ONLY_VARIABLES}
+        variables = {name: value for name, value in variables.items() if name not in INIT_ONLY_VARIABLES}
+        key = (lang, oem, tuple(sorted(init_variables.items())))
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            api = idle.pop() if idle else None
+        if api is None:
+            api = self._new_api(lang, oem, init_variables)
+        defaults = {name: api.GetVariableAsString(name) for name in variables}
+        try:
+            api.SetPageSegMode(self._tesserocr.PSM.AUTO if psm is None else psm)
+            for name, value in variables.items():
+                api.SetVariable(name, value)
+            yield api
+        finally:
+            api.Clear()
+            for name, value in defaults.items():
+                if value is not None:
+                    api.SetVariable(name, value)
+            with self._lock:
+                self._idle[key].append(api)
+
+    def image_to_data(self, img, lang, config=''):
+        """Words with their boxes, lines and confidences (see parse_tsv)"""
+        psm, oem, variables = parse_config(config)
+        with self._api(lang, psm, oem, variables) as api, stage('ocr'):
+            api.SetImage(img)
+            tsv = api.GetTSVText(0)
+        return parse_tsv(tsv)
+
+    def detect_orientation(self, img):
+        """(clockwise degrees that turn the text upright, confidence), or None when Tesseract can't tell"""
+        psm, oem, variables = parse_config(OSD_CONFIG)
+        try:
+            with self._api('osd', psm, oem, variables) as api:
+                api.SetImage(img)
+                osd = api.DetectOrientationScript()
+        except RuntimeError:
+            # osd.traineddata isn't installed
+            return None
+        if not osd:
+            return None
+        return (360 - osd['orient_deg']) % 360, osd['orient_conf']
+
+
+_engine = None
+_engine_pid = None
+
+
+def get_engine():
+    """Return this process's OCR engine.
+
+    ``OCR_ENGINE`` selects ``tesserocr``, ``pytesseract`` or ``auto``
+    (default: tesserocr when installed). The engine is rebuilt after a
+    fork so pool workers never share Tesseract handles with their parent.
+    """
+    global _engine, _engine_pid
+    if _engine is None or _engine_pid != os.getpid():
+        choice = os.environ.get('OCR_ENGINE', 'auto')
+        if choice == 'tesserocr' and not tesserocr_available():
+            raise ImportError("OCR_ENGINE=tesserocr but tesserocr is not installed. Install it with 'pip install tesserocr'.")
+        if choice == 'tesserocr' or (choice == 'auto' and tesserocr_available()):
+            _engine = TesserocrEngine(tessdata_path=os.environ.get('TESSDATA_PREFIX'))
+        else:
+            _engine = PytesseractEngine()
+        _engine_pid = os.getpid()
+    return _engine
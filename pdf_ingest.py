@@ -0,0 +1,105 @@
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from identification import extract_id_info
+from metrics import bind
+from preprocess import TARGET_DPI
+
+# Directory holding poppler's binaries when they aren't on PATH
+POPPLER_PATH = os.environ.get('POPPLER_PATH') or None
+# Pages rendered and processed at once; bounds memory for long documents
+# (idcore.init_pool_worker sets 1 in pool workers)
+PAGE_WINDOW = int(os.environ.get('PDF_PAGE_WINDOW', min(4, os.cpu_count() or 1)))
+# Documents passed as bytes are written here once so poppler can read them
+PDF_SPOOL_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+def is_pdf(data):
+    return data[:4] == b'%PDF'
+
+
+def _pdf2image():
+    # Imported on first use; it pulls in PIL
+    try:
+        import pdf2image
+    except ImportError:
+        raise ImportError("pdf2image is not installed. Please install it with 'pip install pdf2image' and ensure poppler is available.")
+    return pdf2image
+
+
+@contextmanager
+def pdf_path(source):
+    """Yield a filesystem path for a PDF given as a path or as bytes"""
+    if not isinstance(source, (bytes, bytearray)):
+        yield source
+        return
+    # Closed before poppler opens it: Windows can't open a file that is still open for writing
+    with tempfile.NamedTemporaryFile(suffix='.pdf', dir=PDF_SPOOL_DIR, delete=False) as f:
+        f.write(source)
+    try:
+        yield f.name
+    finally:
+        os.remove(f.name)
+
+
+def page_count(path):
+    return int(_pdf2image().pdfinfo_from_path(path, poppler_path=POPPLER_PATH)['Pages'])
+
+
+def render_page(path, page_number, dpi=None):
+    """Render a single page (1-based) to a grayscale PIL image"""
+    dpi = dpi or TARGET_DPI
+    page = _pdf2image().convert_from_path(path, dpi=dpi, first_page=page_number, last_page=page_number,
+                             grayscale=True, poppler_path=POPPLER_PATH)[0]
+    # Lets preprocessing trust the resolution instead of guessing it
+    page.info['dpi'] = (dpi, dpi)
+    return page
+
+
+def map_pages(source, fn, dpi=None, window=None):
+    """Yield fn(page_number, page_image) for every page of a PDF, in page order.
+
+    Pages are rendered one at a time inside the workers and at most
+    ``window`` pages are rendered or processed at once, so memory stays
+    flat however long the document is. ``source`` is a path or PDF bytes.
+    """
+    window = window or PAGE_WINDOW
+    with pdf_path(source) as path:
+        count = page_count(path)
+
+        def work(page_number):
+            return fn(page_number, render_page(path, page_number, dpi))
+
+        with ThreadPoolExecutor(max_workers=window) as pool:
+            pending = deque()
+            for page_number in range(1, count + 1):
+                pending.append(pool.submit(bind(work), page_number))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+
+def extract_pdf_info(source, window=None, **options):
+    """Yield extract_id_info results for each card of a PDF, in page order.
+
+    Cards found on a page are warped upright and read one by one; a page
+    with no card outline is read whole. Each result carries its 1-based
+    "Page" number (and "Card" index when segmented). ``options`` are passed
+    to extract_id_info (lang_mode, target_dpi, use_layout).
+    """
+    # OpenCV and numpy are only loaded once a PDF is actually read
+    import numpy as np
+    from card_detect import extract_cards
+
+    def extract_page(page_number, page):
+        results = extract_cards(np.asarray(page), **options) or [extract_id_info(page, **options)]
+        for result in results:
+            result["Page"] = page_number
+        return results
+
+    for results in map_pages(source, extract_page, dpi=options.get('target_dpi'), window=window):
+        yield from results
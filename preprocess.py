@@ -0,0 +1,212 @@
+import io
+import math
+import os
+
+from card_layouts import ID1_ASPECT_RATIO, ID3_ASPECT_RATIO, is_card_shaped
+from metrics import observe_image, stage
+
+# Effective resolution Tesseract is given, overridable per call
+TARGET_DPI = int(os.environ.get('OCR_TARGET_DPI', 300))
+
+# Physical widths used to estimate resolution when the file doesn't say
+ID1_WIDTH_INCHES = 85.60 / 25.4
+ID3_WIDTH_INCHES = 125 / 25.4
+# Anything that isn't a cropped card is assumed to be at most an A4 page
+PAGE_LONG_SIDE_INCHES = 297 / 25.4
+
+# Embedded DPI below this is usually a camera's placeholder 72, not a scan resolution
+MIN_TRUSTED_DPI = 100
+# A card-shaped image measuring finer than this is taken for a page: a
+# landscape A4 scan has the passport page's ratio at over 700 dpi
+MAX_CARD_DPI = 600
+# Never enlarge more than this, and never enlarge a guessed page at all
+MAX_UPSCALE = 2.0
+# Hard cap on decoded pixels regardless of DPI
+MAX_OCR_PIXELS = 16 * 1000 * 1000
+
+# 'osd' turns sideways and upside-down images upright with Tesseract's
+# orientation detection and then straightens small skews, 'deskew' only
+# straightens, 'off' leaves images as decoded
+ORIENTATION_MODE = os.environ.get('OCR_ORIENTATION', 'osd')
+ORIENTATION_MODES = {'osd', 'deskew', 'off'}
+# Orientation and skew are measured on a copy with at most this long a side
+ORIENT_MAX_SIDE = 1000
+# Orientation detected with less confidence than this is ignored
+MIN_ORIENTATION_CONFIDENCE = 1.5
+# Skews searched (degrees either way) and the smallest one worth resampling for
+MAX_SKEW = 10
+MIN_SKEW = 0.5
+# Ink pixels sampled for the skew estimate
+SKEW_SAMPLES = 20000
+
+
+def estimate_dpi(img):
+    """Return (dpi, trusted) for a PIL image.
+
+    Scanner DPI metadata is used when plausible. Otherwise cropped cards are
+    measured against their standard physical width (unless that implies a
+    finer scan than MAX_CARD_DPI) and anything else against an A4 page;
+    only the latter is flagged as untrusted.
+    """
+    width, height = img.size
+    dpi = img.info.get('dpi')
+    if dpi and dpi[0] >= MIN_TRUSTED_DPI:
+        return float(dpi[0]), True
+    if is_card_shaped(img.size):
+        ratio = width / height
+        if abs(ratio - ID1_ASPECT_RATIO) <= abs(ratio - ID3_ASPECT_RATIO):
+            card_dpi = width / ID1_WIDTH_INCHES
+        else:
+            card_dpi = width / ID3_WIDTH_INCHES
+        if card_dpi <= MAX_CARD_DPI:
+            return card_dpi, True
+    return max(width, height) / PAGE_LONG_SIDE_INCHES, False
+
+
+def choose_scale(img, target_dpi=None):
+    """Scale factor that brings an image to the target effective DPI"""
+    target_dpi = target_dpi or TARGET_DPI
+    dpi, trusted = estimate_dpi(img)
+    scale = target_dpi / dpi
+    scale = min(scale, MAX_UPSCALE if trusted else 1.0)
+    width, height = img.size
+    scale = min(scale, math.sqrt(MAX_OCR_PIXELS / (width * height)))
+    # Not worth resampling for a few percent
+    if abs(scale - 1.0) < 0.05:
+        scale = 1.0
+    return scale
+
+
+def load_for_ocr(data, target_dpi=None):
+    """Decode image bytes into a grayscale image sized for OCR.
+
+    JPEGs are decoded at a reduced DCT scale (PIL ``draft``) straight to
+    grayscale when the target size allows, so a 50 MP photo never exists in
+    memory at full resolution. Returns (image, info) where info reports the
+    original size, the final size, the scale applied and the target DPI.
+    """
+    from PIL import Image
+    return prepare_for_ocr(Image.open(io.BytesIO(data)), target_dpi)
+
+
+def prepare_for_ocr(img, target_dpi=None):
+    """Grayscale and resize an opened or in-memory PIL image for OCR.
+
+    Same as load_for_ocr for images that are already decoded, such as
+    rendered PDF pages or crops; the reduced decode only applies to JPEGs
+    that haven't been loaded yet.
+    """
+    from PIL import Image, ImageOps
+    target_dpi = target_dpi or TARGET_DPI
+    original_size = img.size
+    scale = choose_scale(img, target_dpi)
+    target_size = (max(1, round(original_size[0] * scale)), max(1, round(original_size[1] * scale)))
+
+    observe_image(original_size)
+
+    with stage('decode'):
+        # No-op for formats other than JPEG; picks the largest 1/2, 1/4 or 1/8
+        # reduction that is still at least the target size
+        img.draft('L', target_size)
+        img.load()
+
+    with stage('preprocess'):
+        img = ImageOps.exif_transpose(img)
+        if img.mode != 'L':
+            img = img.convert('L')
+
+        # EXIF rotation may have swapped the axes
+        if (img.size[0] > img.size[1]) != (target_size[0] > target_size[1]):
+            target_size = (target_size[1], target_size[0])
+        if img.size != target_size:
+            img = img.resize(target_size, Image.Resampling.LANCZOS)
+
+    info = {
+        'original_size': list(original_size),
+        'size': list(img.size),
+        'scale': round(scale, 4),
+        'target_dpi': target_dpi
+    }
+    return img, info
+
+
+def _ink_points(img):
+    """(y, x) coordinates of a sample of the dark pixels of a grayscale image, by Otsu's threshold"""
+    import numpy as np
+    pixels = np.asarray(img)
+    histogram = np.bincount(pixels.ravel(), minlength=256).astype(float)
+    weights = np.cumsum(histogram)
+    sums = np.cumsum(histogram * np.arange(256))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = (sums[-1] * weights - sums * weights[-1]) ** 2 / (weights * (weights[-1] - weights))
+    threshold = int(np.nanargmax(between)) if np.isfinite(between).any() else 127
+    ink = pixels <= threshold
+    # Light text on a dark background
+    if ink.mean() > 0.5:
+        ink = ~ink
+    ys, xs = np.nonzero(ink)
+    step = max(1, len(ys) // SKEW_SAMPLES)
+    return ys[::step].astype(float), xs[::step].astype(float)
+
+
+def estimate_skew(img):
+    """Counter-clockwise tilt (degrees) of the text lines of a grayscale image, or 0.0.
+
+    Projects a sample of the ink onto the vertical at each candidate angle,
+    whole degrees first and then tenths around the best; text lines are
+    level where the row profile is sharpest.
+    """
+    import numpy as np
+    ys, xs = _ink_points(img)
+    if len(ys) < 100:
+        return 0.0
+
+    def sharpness(angle):
+        theta = np.radians(angle)
+        rows = ys * np.cos(theta) + xs * np.sin(theta)
+        profile = np.bincount(np.round(rows - rows.min()).astype(np.int64))
+        return float(np.dot(profile, profile))
+
+    best = max(range(-MAX_SKEW, MAX_SKEW + 1), key=sharpness)
+    best = max((best + step / 10 for step in range(-9, 10)), key=sharpness)
+    # No angle clearly beats leaving the image as it is
+    if sharpness(best) < sharpness(0.0) * 1.02:
+        return 0.0
+    return round(best, 1)
+
+
+def correct_orientation(img, detect_orientation=None, mode=None):
+    """Turn a grayscale image upright and straighten it before OCR.
+
+    ``detect_orientation`` is an OCR engine's orientation detector, run on
+    a downscaled copy. Returns (image, info) where info reports the mode,
+    the clockwise quarter ``rotation`` applied (0, 90, 180 or 270) with its
+    confidence, and the counter-clockwise ``skew`` straightened out.
+    """
+    from PIL import Image
+    mode = mode or ORIENTATION_MODE
+    info = {'mode': mode, 'rotation': 0, 'skew': 0.0}
+    if mode == 'off':
+        return img, info
+
+    with stage('orient'):
+        # Integer box reduction: a fraction of the cost of a resampled thumbnail
+        factor = math.ceil(max(img.size) / ORIENT_MAX_SIDE)
+        small = img.reduce(factor) if factor > 1 else img
+        if mode == 'osd' and detect_orientation is not None:
+            detected = detect_orientation(small)
+            if detected is not None:
+                rotation, confidence = detected
+                info['orientation_confidence'] = round(confidence, 2)
+                if rotation % 360 and confidence >= MIN_ORIENTATION_CONFIDENCE:
+                    info['rotation'] = rotation % 360
+                    img = img.rotate(-info['rotation'], expand=True)
+                    small = small.rotate(-info['rotation'], expand=True)
+
+        skew = estimate_skew(small)
+        if abs(skew) >= MIN_SKEW:
+            # Same size, so layout regions still line up with the card; bilinear
+            # is half the cost of bicubic on a full page and reads as well
+            img = img.rotate(-skew, resample=Image.Resampling.BILINEAR, fillcolor=255)
+            info['skew'] = skew
+    return img, info
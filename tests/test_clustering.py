@@ -0,0 +1,31 @@
+from clustering import cluster_identities
+
+
+def card(id_type, field, number, name="Aarav Sharma", dob="01/01/1990"):
+    return {"ID Type": id_type, "Details": {field: number, "Name": name, "Date of Birth": dob}}
+
+
+AADHAAR_A = card("Aadhaar Card", "Aadhaar Number", "2345 6789 0124")
+PAN = card("PAN Card", "PAN Number", "ABCDE1234F")
+AADHAAR_C = card("Aadhaar Card", "Aadhaar Number", "9876 5432 1098")
+
+
+def groups(infos):
+    return sorted(sorted(infos[index]["Details"].get("Aadhaar Number", "") for index in group["indices"])
+                  for group in cluster_identities(infos)["groups"])
+
+
+def test_different_numbers_of_one_type_never_share_a_group():
+    for infos in ([AADHAAR_A, PAN, AADHAAR_C], [PAN, AADHAAR_A, AADHAAR_C]):
+        for group in groups(infos):
+            assert len([number for number in group if number]) <= 1
+
+
+def test_different_names_never_share_a_group():
+    # The nameless copy shares AADHAAR_A's number and the PAN card's birth date
+    nameless = card("Aadhaar Card", "Aadhaar Number", "2345 6789 0124", name=None, dob="02/02/1992")
+    renamed = card("PAN Card", "PAN Number", "ABCDE1234F", name="Rohan Verma", dob="02/02/1992")
+    for infos in ([AADHAAR_A, nameless, renamed], [renamed, nameless, AADHAAR_A]):
+        for group in cluster_identities(infos)["groups"]:
+            names = {infos[index]["Details"]["Name"] for index in group["indices"]} - {None}
+            assert len(names) <= 1
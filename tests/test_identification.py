@@ -0,0 +1,7 @@
+from identification import find_card_number
+
+
+def test_aadhaar_number_after_a_date_on_the_previous_line():
+    # "1990\n2345 6789" must not swallow the start of the real number
+    assert find_card_number("Aadhaar Card", "DOB: 01/01/1990\n2345 6789 0124") == "234567890124"
+    assert find_card_number("Aadhaar Card", "DOB: 01/01/1990 2345 6789 0124") == "234567890124"
@@ -0,0 +1,132 @@
+"""Structural checks of extracted card numbers and dates of birth.
+
+A value that passes is very unlikely to be an OCR misread: Aadhaar numbers
+carry a Verhoeff check digit, PAN numbers encode the holder type in their
+fourth character, and DL numbers start with a state code.
+"""
+import re
+from datetime import date, datetime
+
+# Verhoeff dihedral group multiplication, position permutation and inverse tables
+_VERHOEFF_D = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9],
+    [1, 2, 3, 4, 0, 6, 7, 8, 9, 5],
+    [2, 3, 4, 0, 1, 7, 8, 9, 5, 6],
+    [3, 4, 0, 1, 2, 8, 9, 5, 6, 7],
+    [4, 0, 1, 2, 3, 9, 5, 6, 7, 8],
+    [5, 9, 8, 7, 6, 0, 4, 3, 2, 1],
+    [6, 5, 9, 8, 7, 1, 0, 4, 3, 2],
+    [7, 6, 5, 9, 8, 2, 1, 0, 4, 3],
+    [8, 7, 6, 5, 9, 3, 2, 1, 0, 4],
+    [9, 8, 7, 6, 5, 4, 3, 2, 1, 0],
+]
+_VERHOEFF_P = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9],
+    [1, 5, 7, 6, 2, 8, 3, 0, 9, 4],
+    [5, 8, 0, 3, 7, 9, 6, 1, 4, 2],
+    [8, 9, 1, 6, 0, 4, 3, 5, 2, 7],
+    [9, 4, 5, 3, 1, 2, 6, 8, 7, 0],
+    [4, 2, 8, 6, 5, 7, 3, 9, 0, 1],
+    [2, 7, 9, 3, 8, 0, 6, 4, 1, 5],
+    [7, 0, 4, 6, 9, 1, 3, 2, 5, 8],
+]
+_VERHOEFF_INV = [0, 4, 3, 2, 1, 5, 6, 7, 8, 9]
+
+# Fourth character of a PAN: the kind of holder (P is an individual)
+PAN_HOLDER_TYPES = "ABCFGHJLPT"
+# State and union territory codes that start a driving licence number
+DL_STATE_CODES = {
+    "AN", "AP", "AR", "AS", "BR", "CG", "CH", "DD", "DL", "DN", "GA", "GJ", "HP", "HR", "JH", "JK", "KA", "KL",
+    "LA", "LD", "MH", "ML", "MN", "MP", "MZ", "NL", "OD", "OR", "PB", "PY", "RJ", "SK", "TG", "TN", "TR", "TS",
+    "UA", "UK", "UP", "WB",
+}
+# Date of birth formats find_date_of_birth returns
+DOB_FORMATS = ["%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%Y/%m/%d", "%Y-%m-%d"]
+EARLIEST_BIRTH_YEAR = 1900
+
+
+def _verhoeff(digits):
+    check = 0
+    for position, digit in enumerate(reversed(digits)):
+        check = _VERHOEFF_D[check][_VERHOEFF_P[position % 8][int(digit)]]
+    return check
+
+
+def verhoeff_check_digit(digits):
+    """The Verhoeff check digit to append to a string of digits"""
+    return str(_VERHOEFF_INV[_verhoeff(digits + "0")])
+
+
+def verhoeff_valid(digits):
+    """True if a string of digits ends with its Verhoeff check digit"""
+    return digits.isdigit() and _verhoeff(digits) == 0
+
+
+def _compact(number):
+    return re.sub(r"\s", "", str(number or "")).upper()
+
+
+def valid_aadhaar(number):
+    # 12 digits, never starting with 0 or 1, the last a Verhoeff check digit
+    number = _compact(number)
+    return bool(re.fullmatch(r"[2-9]\d{11}", number)) and verhoeff_valid(number)
+
+
+def valid_pan(number):
+    number = _compact(number)
+    return bool(re.fullmatch(r"[A-Z]{5}\d{4}[A-Z]", number)) and number[3] in PAN_HOLDER_TYPES
+
+
+def valid_passport(number):
+    return bool(re.fullmatch(r"[A-Z]\d{7}", _compact(number)))
+
+
+def valid_driving_licence(number):
+    number = _compact(number)
+    # State code, RTO code and 11 to 15 more digits
+    return bool(re.fullmatch(r"[A-Z]{2}\d{13,17}", number)) and number[:2] in DL_STATE_CODES
+
+
+def valid_voter_id(number):
+    return bool(re.fullmatch(r"[A-Z]{3}\d{7}", _compact(number)))
+
+
+# Card number check for each ID type
+NUMBER_VALIDATORS = {
+    "Aadhaar Card": valid_aadhaar,
+    "PAN Card": valid_pan,
+    "Passport": valid_passport,
+    "Driving License": valid_driving_licence,
+    "Voter ID": valid_voter_id,
+}
+
+
+def valid_card_number(id_type, number):
+    """True if a number has the structure of the ID type's card numbers"""
+    validator = NUMBER_VALIDATORS.get(id_type)
+    return validator is not None and validator(number)
+
+
+def valid_date_of_birth(value, today=None):
+    """True if a date of birth is a real calendar date between 1900 and today"""
+    today = today or date.today()
+    for fmt in DOB_FORMATS:
+        try:
+            parsed = datetime.strptime(str(value).strip(), fmt).date()
+        except ValueError:
+            continue
+        return EARLIEST_BIRTH_YEAR <= parsed.year and parsed <= today
+    return False
+
+
+def validate_details(id_type, number_field, details):
+    """Pass or fail for the card number, date of birth and name of a card.
+
+    The number and date must pass their structural checks; a name only has
+    to be present. Missing fields fail.
+    """
+    return {
+        number_field: valid_card_number(id_type, details.get(number_field)),
+        "Date of Birth": valid_date_of_birth(details.get("Date of Birth")),
+        "Name": bool(details.get("Name")),
+    }
@@ -0,0 +1,121 @@
+"""Lines, labels and neighbours over the words of one image_to_data pass.
+
+Words are the dicts returned by ocr_engine's image_to_data: text,
+confidence, box and the (block, paragraph, line) Tesseract put them in.
+"""
+import re
+
+
+def normalize(text):
+    """Upper-case letters and digits of a word, for matching labels and values"""
+    return re.sub(r'[^A-Z0-9]', '', text.upper())
+
+
+def group_lines(words):
+    """Words grouped into lines, in Tesseract's reading order.
+
+    Each line has its ``words`` (left to right), ``text``, bounding box
+    (``left``, ``top``, ``right``, ``bottom``) and ``block`` number.
+    """
+    grouped = {}
+    for word in words:
+        grouped.setdefault(word['line'], []).append(word)
+    lines = []
+    for (block, _, _), line_words in grouped.items():
+        line_words.sort(key=lambda word: word['left'])
+        lines.append({
+            'words': line_words,
+            'text': ' '.join(word['text'] for word in line_words),
+            'block': block,
+            'left': min(word['left'] for word in line_words),
+            'top': min(word['top'] for word in line_words),
+            'right': max(word['left'] + word['width'] for word in line_words),
+            'bottom': max(word['top'] + word['height'] for word in line_words)
+        })
+    return lines
+
+
+def lines_text(lines):
+    """Plain text of lines, with a blank line between Tesseract's blocks"""
+    parts = []
+    for index, line in enumerate(lines):
+        if index and line['block'] != lines[index - 1]['block']:
+            parts.append('')
+        parts.append(line['text'])
+    return '\n'.join(parts)
+
+
+def find_label(lines, labels, exclude_after=()):
+    """Return (line, index of the first word after the label) for the first label found, or (None, None).
+
+    Labels are phrases matched as whole words, ignoring case and
+    punctuation ("D.O.B:" matches "DOB"), tried in the order given. A
+    match directly after one of the ``exclude_after`` words is skipped
+    (e.g. "Father's Name" when looking for "Name").
+    """
+    for label in labels:
+        label_tokens = label.split()
+        for line in lines:
+            tokens = [normalize(word['text']) for word in line['words']]
+            for start in range(len(tokens) - len(label_tokens) + 1):
+                if tokens[start:start + len(label_tokens)] != label_tokens:
+                    continue
+                if start and tokens[start - 1] in exclude_after:
+                    continue
+                return line, start + len(label_tokens)
+    return None, None
+
+
+def words_after(line, index):
+    """Words of a line from index on, without bare separators such as ':'"""
+    return [word for word in line['words'][index:] if normalize(word['text'])]
+
+
+def _overlaps(line, other):
+    return other['left'] <= line['right'] and other['right'] >= line['left']
+
+
+def line_below(lines, line, max_gap=2.5):
+    """Nearest line under a line and overlapping it horizontally, at most max_gap line heights down"""
+    height = max(1, line['bottom'] - line['top'])
+    best = None
+    for other in lines:
+        gap = other['top'] - line['bottom']
+        if other is line or other['top'] <= line['top'] + height / 2 or gap > max_gap * height:
+            continue
+        if _overlaps(line, other) and (best is None or other['top'] < best['top']):
+            best = other
+    return best
+
+
+def line_above(lines, line, max_gap=2.5):
+    """Nearest line over a line and overlapping it horizontally, at most max_gap line heights up"""
+    height = max(1, line['bottom'] - line['top'])
+    best = None
+    for other in lines:
+        gap = line['top'] - other['bottom']
+        if other is line or other['bottom'] >= line['bottom'] - height / 2 or gap > max_gap * height:
+            continue
+        if _overlaps(line, other) and (best is None or other['bottom'] > best['bottom']):
+            best = other
+    return best
+
+
+def value_confidence(lines, value):
+    """Mean confidence (0-1) of the words a value was read from, or None if they can't be found.
+
+    Takes the line covering most of the value with words that are part
+    of it, so labels and neighbouring text on the line don't count.
+    """
+    target = normalize(str(value))
+    if not target:
+        return None
+    best, best_covered = None, 0
+    for line in lines:
+        words = [word for word in line['words'] if normalize(word['text']) and normalize(word['text']) in target]
+        covered = sum(len(normalize(word['text'])) for word in words)
+        if covered > best_covered:
+            best, best_covered = words, covered
+    if not best:
+        return None
+    return round(sum(max(word['conf'], 0) for word in best) / len(best) / 100, 3)